@@ -0,0 +1,79 @@
+# benchmarks/bench_corr.py
+# asv benchmarks of `computation._corr`, see `asv.conf.json` for usage.
+# A single benchmark can also be run in the current environment, e.g.:
+#   asv run --python=same --quick --bench "Correlation.time_correlation"
+
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from aa_utilities.computation import _corr
+
+
+def _methods(A):
+    return {
+        'pearson': lambda: _corr.pearson(A),
+        'pearson_numba_lm0': lambda: _corr._pearson_numba(A, A, low_memory=False, dtype=A.dtype.type),
+        'pearson_numba_lm1': lambda: _corr._pearson_numba(A, A, low_memory=True, dtype=A.dtype.type),
+        'pearson_numpy': lambda: _corr._pearson_numpy(A, A),
+        'spearman': lambda: _corr.spearman(A),
+        'np_corrcoef': lambda: np.corrcoef(A),
+        'pd_corr': lambda: pd.DataFrame(A.T).corr(method='pearson'),
+    }
+
+
+class Correlation:
+    """Self-correlation of an (n x k) matrix, per implementation, shape, dtype and thread count.
+    The thread count limits both the numba kernels and the BLAS/OpenMP pools.
+    """
+
+    params = (
+        list(_methods(None)),
+        ['200x1000', '1000x200', '4000x100'],
+        ['float32', 'float64'],
+        [1, 4],
+    )
+    param_names = ['method', 'shape', 'dtype', 'n_threads']
+    timeout = 300
+
+    def setup(self, method, shape, dtype, n_threads):
+        n, k = map(int, shape.split('x'))
+        rng = np.random.default_rng(seed=0)
+        self.func = _methods(rng.normal(size=(n, k)).astype(dtype))[method]
+        self.limits = threadpool_limits(limits=n_threads)
+        self.threads = _corr._num_threads(n_threads)
+        self.threads.__enter__()
+        self.func()  # compiles (or loads from the cache) the numba kernels outside the timings
+
+    def teardown(self, method, shape, dtype, n_threads):
+        self.threads.__exit__(None, None, None)
+        self.limits.restore_original_limits()
+
+    def time_correlation(self, method, shape, dtype, n_threads):
+        self.func()
+
+    def peakmem_correlation(self, method, shape, dtype, n_threads):
+        self.func()
+
+
+class Tiled:
+    """Out-of-core (tiled) self-correlation, whose peak memory should follow `block_size`."""
+
+    params = (
+        ['pearson', 'spearman'],
+        [256, 1024],
+    )
+    param_names = ['method', 'block_size']
+    timeout = 300
+
+    def setup(self, method, block_size):
+        rng = np.random.default_rng(seed=0)
+        self.A = rng.normal(size=(4000, 200))
+        self.func = getattr(_corr, method)
+        self.func(self.A[:8], block_size=4)
+
+    def time_tiled(self, method, block_size):
+        self.func(self.A, block_size=block_size, condensed=True)
+
+    def peakmem_tiled(self, method, block_size):
+        self.func(self.A, block_size=block_size, condensed=True)
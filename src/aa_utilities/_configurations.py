@@ -20,5 +20,13 @@ class Configs:
         level=logging.DEBUG,
     )
 
+    # number of threads used by the parallel numba kernels (e.g., in `computation._corr`)
+    # None: use all threads available to numba
+    # cache: store the compiled kernels on disk (next to the module, or in `NUMBA_CACHE_DIR`)
+    numba = SimpleNamespace(
+        n_threads=None,
+        cache=True,
+    )
+
 
 configs = Configs()
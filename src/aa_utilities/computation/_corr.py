@@ -1,53 +1,236 @@
+from contextlib import contextmanager as _contextmanager
+from functools import partial as _partial, update_wrapper as _update_wrapper
+import sys as _sys
 
-from numba import jit as _jit
 import numpy as _np
 
+from .._configurations import configs as _configs
+
+# replaced by `numba.prange` when the first kernel is compiled (see `_LazyJit`)
+_prange = range
+
+
+class _LazyJit:
+    """A numba `jit` that is deferred to the first call, so that importing this module (or using
+    the functions that do not correlate) does not import numba. The compiled machine code is
+    cached on disk (see `configs.numba.cache`), so only the very first run pays the compilation.
+    """
+
+    # every deferred kernel of this module (e.g., to check that `precompile` covers them all)
+    kernels = []
+
+    def __init__(self, func, options):
+        self.func = func
+        self.options = options
+        self.dispatcher = None
+        _update_wrapper(self, func)
+        _LazyJit.kernels.append(self)
+
+    def materialize(self):
+        if self.dispatcher is None:
+            import numba
+            module_globals = self.func.__globals__
+            module_globals['_prange'] = numba.prange
+            # kernels called from this kernel must be numba dispatchers before it is compiled
+            for name in self.func.__code__.co_names:
+                callee = module_globals.get(name)
+                if isinstance(callee, _LazyJit) and callee is not self:
+                    callee.materialize()
+            self.dispatcher = numba.jit(cache=_configs.numba.cache, **self.options)(self.func)
+            module_globals[self.func.__name__] = self.dispatcher
+        return self.dispatcher
+
+    def __call__(self, *args, **kwargs):
+        return self.materialize()(*args, **kwargs)
+
+
+def _jit(**options):
+    return lambda func: _LazyJit(func, options)
+
+
+@_contextmanager
+def _num_threads(n_threads=None):
+    """Temporarily sets the number of threads used by the parallel numba kernels.
+    If `n_threads` is None, `configs.numba.n_threads` is used (None: all available threads).
+    """
+    if n_threads is None:
+        n_threads = _configs.numba.n_threads
+    if n_threads is None:
+        yield
+        return
+    import numba as _numba
+    n_threads = max(1, min(int(n_threads), _numba.config.NUMBA_NUM_THREADS))
+    n_prev = _numba.get_num_threads()
+    _numba.set_num_threads(n_threads)
+    try:
+        yield
+    finally:
+        _numba.set_num_threads(n_prev)
+
+
+def _float_dtype(mat, dtype=None):
+    """The dtype of the computations: `dtype` if given, otherwise float32 inputs stay float32
+    and anything else (e.g., integers) is computed in float64."""
+    if dtype is not None:
+        return _np.dtype(dtype)
+    if getattr(mat, 'dtype', None) == _np.float32:
+        return _np.dtype(_np.float32)
+    return _np.dtype(_np.float64)
+
 
 # source: https://stackoverflow.com/questions/52371329
-@_jit(nopython=True) # Set "nopython" mode for best performance, equivalent to @njit
-def mean(mat):
+@_jit(nopython=True, parallel=True) # Set "nopython" mode for best performance, equivalent to @njit
+def mean(mat, dtype=_np.float64):
     n = len(mat)
-    b = _np.empty(n)
-    for i in range(n):
+    b = _np.empty(n, dtype=dtype)
+    for i in _prange(n):
         b[i] = mat[i].mean()
     return b
 
-@_jit(nopython=True)
-def std(mat):
+@_jit(nopython=True, parallel=True)
+def std(mat, dtype=_np.float64):
     n = len(mat)
-    b = _np.empty(n)
-    for i in range(n):
+    b = _np.empty(n, dtype=dtype)
+    for i in _prange(n):
         b[i] = mat[i].std()
     return b
 
-@_jit(nopython=True)
-def rank(mat):
-    i, j = _np.meshgrid(*map(_np.arange, mat.shape), indexing='ij')
-    s = mat.argsort(1)
-    out = _np.empty_like(s)
-    out[i, s] = j
+@_jit(nopython=True, parallel=True)
+def _scatter_ranks(order, dtype=_np.float64):
+    n, k = order.shape
+    out = _np.empty((n, k), dtype=dtype)
+    for i in _prange(n):
+        for j in range(k):
+            out[i, order[i, j]] = j + 1
     return out
 
+@_jit(nopython=True, parallel=True)
+def _average_ranks(mat, order, dtype=_np.float64):
+    """Assigns the average of their (1-based) positions to the runs of tied values.
+    NaNs (sorted last by numpy) keep a NaN rank."""
+    n, k = order.shape
+    out = _np.empty((n, k), dtype=dtype)
+    for i in _prange(n):
+        j = 0
+        while j < k:
+            value = mat[i, order[i, j]]
+            if _np.isnan(value):
+                for u in range(j, k):
+                    out[i, order[i, u]] = _np.nan
+                break
+            t = j + 1
+            while t < k and mat[i, order[i, t]] == value:
+                t += 1
+            avg = (j + t + 1) / 2.0
+            for u in range(j, t):
+                out[i, order[i, u]] = avg
+            j = t
+    return out
+
+def rank(mat, method='average', dtype=None):
+    """Row-wise ranks, equivalent to `scipy.stats.rankdata(mat, method=method, axis=1)` for
+    rows without NaNs.
+
+    Rows with NaNs are handled differently from scipy (which returns an all-NaN row): with
+    `average`, NaNs keep a NaN rank and the other values are ranked among themselves (e.g.,
+    `[[3, nan, 5]]` gives `[[1, nan, 2]]`); with `ordinal`, NaNs are ranked after all values.
+
+    Args:
+        mat (np.ndarray): An (n x k) matrix.
+        method (str, optional): How tied values are ranked; `average` assigns the average rank
+            of the tied values, `ordinal` assigns distinct ranks in their order of appearance.
+            Defaults to 'average'.
+        dtype (np.dtype, optional): The dtype of the ranks. Defaults to None (i.e., float32
+            for float32 inputs, otherwise float64).
+
+    Returns:
+        np.ndarray: An (n x k) matrix of (1-based) ranks.
+    """
+    assert method in ('average', 'ordinal'), f'Unknown ranking method: {method}'
+    # numpy's (SIMD) argsort is considerably faster than the one compiled by numba
+    dtype = _float_dtype(mat, dtype)
+    if method == 'ordinal':
+        return _scatter_ranks(_np.argsort(mat, axis=1, kind='stable'), dtype)
+    return _average_ranks(mat, _np.argsort(mat, axis=1), dtype)
+
+@_jit(nopython=True, parallel=True)
+def _standardize(mat, dtype=_np.float64):
+    """Centres each row and scales it to unit norm, so that `Za @ Zb.T` is Pearson's r.
+    The row statistics are accumulated in float64, regardless of `dtype`."""
+    n, k = mat.shape
+    out = _np.empty((n, k), dtype=dtype)
+    for i in _prange(n):
+        mu = 0.0
+        for j in range(k):
+            mu += mat[i, j]
+        mu /= k
+        ss = 0.0
+        for j in range(k):
+            d = mat[i, j] - mu
+            ss += d * d
+        scale = 1.0 / _np.sqrt(ss)
+        for j in range(k):
+            out[i, j] = (mat[i, j] - mu) * scale
+    return out
+
+@_jit(nopython=True, parallel=True, fastmath=True)
+def _dot_rows(za, zb):
+    n = za.shape[0]
+    m = zb.shape[0]
+    out = _np.empty((n, m), dtype=za.dtype)
+    k = za.shape[1]
+    for i in _prange(n):
+        for j in range(m):
+            acc = 0.0
+            for t in range(k):
+                acc += za[i, t] * zb[j, t]
+            out[i, j] = acc
+    return out
+
+@_jit(nopython=True, parallel=True, fastmath=True)
+def _dot_rows_symmetric(za):
+    """Same as `_dot_rows(za, za)`, but only the upper triangle is computed and then mirrored."""
+    n, k = za.shape
+    out = _np.empty((n, n), dtype=za.dtype)
+    for i in _prange(n):
+        for j in range(i, n):
+            acc = 0.0
+            for t in range(k):
+                acc += za[i, t] * za[j, t]
+            out[i, j] = acc
+            out[j, i] = acc
+    return out
+
+@_jit(nopython=True, parallel=True)
+def _fill_condensed(out, tile, i0, j0, n):
+    """Copies the strictly upper triangular part of a tile into a condensed distance vector
+    (see `scipy.spatial.distance.squareform`) of an (n x n) matrix."""
+    n_rows, n_cols = tile.shape
+    for r in _prange(n_rows):
+        i = i0 + r
+        offset = i * n - i * (i + 1) // 2 - i - 1
+        for c in range(max(0, i + 1 - j0), n_cols):
+            out[offset + j0 + c] = tile[r, c]
+
 @_jit(nopython=True)
-def _pearson_numba(A, B, low_memory=False):
+def _pearson_numba(A, B, low_memory=False, dtype=_np.float64):
     """ Pearson's correlation """
     
-    n, k = A.shape
-    m, k = B.shape
-
-    mu_a = mean(A)
-    mu_b = mean(B)
-    sig_a = std(A)
-    sig_b = std(B)
+    za = _standardize(A, dtype)
+    zb = _standardize(B, dtype)
 
     if low_memory:
-        out = _np.empty((n, m))
-        for i in range(n):
-            for j in range(m):
-                out[i, j] = (A[i] - mu_a[i]) @ (B[j] - mu_b[j]) / (k * sig_a[i] * sig_b[j])
-        return out
+        return _dot_rows(za, zb)
     else:    
-        return (A - mu_a[:, None]) @ (B - mu_b[:, None]).T / (k * sig_a * sig_b[:, None])
+        return za @ zb.T
+
+def _correlate(za, zb=None, low_memory=False):
+    """Correlates standardized rows; `zb=None` lets BLAS use its symmetric (syrk) product."""
+    if low_memory:
+        return _dot_rows_symmetric(za) if zb is None else _dot_rows(za, zb)
+    if zb is None:
+        return za @ za.T
+    return za @ zb.T
     
 
 # source: https://stackoverflow.com/questions/71844846
@@ -59,42 +242,917 @@ def _pearson_numpy(A, B):
         _np.sqrt(_np.sum(bm**2, axis=1, keepdims=True))
     )
 
-def spearman(A, B=None, low_memory=False):
-    if B is None:
-        return _pearson_numba(rank(A), rank(A), low_memory=low_memory)
+def _standardize_ranks(mat, dtype=_np.float64):
+    return _standardize(rank(mat, dtype=dtype), dtype)
+
+@_jit(nopython=True, parallel=True)
+def _standardize_biweight(mat, dtype=_np.float64):
+    """Biweight-weighted deviations from the median, scaled to unit norm, so that `Za @ Zb.T` is
+    the biweight midcorrelation. The median and MAD are computed once per row; rows with a zero
+    MAD fall back to Pearson's standardization (as `pearsonFallback='individual'` in WGCNA)."""
+    n, k = mat.shape
+    out = _np.empty((n, k), dtype=dtype)
+    for i in _prange(n):
+        row = mat[i].astype(_np.float64)
+        dev = row - _np.median(row)
+        mad = _np.median(_np.abs(dev))
+        if mad > 0:
+            u = dev / (9.0 * mad)
+            dev *= _np.where(_np.abs(u) < 1.0, (1.0 - u * u) ** 2, 0.0)
+        else:
+            dev = row - row.mean()
+        scale = 1.0 / _np.sqrt(_np.sum(dev * dev))
+        for j in range(k):
+            out[i, j] = dev[j] * scale
+    return out
+
+def _block_size(k, block_size=None, max_memory=None, itemsize=8):
+    """Number of rows per tile, such that a tile roughly fits within `max_memory` bytes.
+
+    Each tile holds two (bs x k) standardized blocks, their sorting/ranking intermediates,
+    and a (bs x bs) result block, i.e., `itemsize * (bs**2 + 4 * k * bs)` bytes.
+    """
+    if block_size is not None:
+        return max(1, int(block_size))
+    if max_memory is None:
+        return 1024
+    n_elements = max_memory / itemsize
+    return max(1, int(-2 * k + _np.sqrt(4 * k**2 + n_elements)))
+
+def _open_output(out, shape, dtype=_np.float64):
+    """Prepares the array that receives the tiles: in memory, an `.npy` file, or a given array."""
+    if out is None:
+        return _np.empty(shape, dtype=dtype)
+    if isinstance(out, _np.ndarray):
+        assert out.shape == shape, f'`out` must have a shape of {shape}, got {out.shape}'
+        return out
+    return _np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=shape)
+
+def _iter_tiles(A, B, transform, block_size, upper=False):
+    """Yields `(rows, cols, tile)` of the correlation between `A` and `B`, tile by tile.
+    Only a (block_size x k) slice of each input is transformed (e.g., ranked) at a time.
+    If `upper` is True (i.e., `B` is `A`), only the tiles on and above the diagonal are yielded.
+    """
+    n = A.shape[0]
+    m = B.shape[0]
+    for i0 in range(0, n, block_size):
+        rows = slice(i0, min(i0 + block_size, n))
+        za = transform(A[rows])
+        for j0 in range(i0 if upper else 0, m, block_size):
+            cols = slice(j0, min(j0 + block_size, m))
+            if upper and j0 == i0:
+                yield rows, cols, za @ za.T
+                continue
+            zb = transform(B[cols])
+            yield rows, cols, za @ zb.T
+
+def _correlate_tiled(A, B, transform, out=None, block_size=None, max_memory=None, condensed=False, dtype=_np.float64):
+    symmetric = B is None or B is A
+    assert symmetric or not condensed, '`condensed` is only available for self-correlations (i.e., `B=None`)'
+    n = A.shape[0]
+    block_size = _block_size(A.shape[1], block_size=block_size, max_memory=max_memory, itemsize=dtype.itemsize)
+    if condensed:
+        out = _open_output(out, shape=(n * (n - 1) // 2, ), dtype=dtype)
+    else:
+        out = _open_output(out, shape=(n, n if symmetric else B.shape[0]), dtype=dtype)
+    transform = _partial(transform, dtype=dtype)
+    for rows, cols, tile in _iter_tiles(A, A if symmetric else B, transform, block_size, upper=symmetric):
+        if condensed:
+            _fill_condensed(out, tile, rows.start, cols.start, n)
+        else:
+            out[rows, cols] = tile
+            if symmetric:
+                out[cols, rows] = tile.T
+    if isinstance(out, _np.memmap):
+        out.flush()
+    return out
+
+@_jit(nopython=True, parallel=True)
+def _masked_centre(mat, dtype=_np.float64):
+    """Centres rows by the mean of their non-NaN values.
+    Returns the centred values (NaNs replaced by zeros) and the (0/1) mask of observed values."""
+    n, k = mat.shape
+    x = _np.zeros((n, k), dtype=dtype)
+    w = _np.zeros((n, k), dtype=dtype)
+    for i in _prange(n):
+        total = 0.0
+        count = 0
+        for j in range(k):
+            if not _np.isnan(mat[i, j]):
+                total += mat[i, j]
+                count += 1
+        mu = total / count if count > 0 else 0.0
+        for j in range(k):
+            if not _np.isnan(mat[i, j]):
+                x[i, j] = mat[i, j] - mu
+                w[i, j] = 1.0
+    return x, w
+
+@_jit(nopython=True, parallel=True, fastmath=True)
+def _pairwise_sums(xa, wa, xb, wb):
+    """Per pair co-moments over the observations present in both rows, without copying pairs."""
+    n, k = xa.shape
+    m = xb.shape[0]
+    n_obs = _np.empty((n, m))
+    sx = _np.empty((n, m))
+    sy = _np.empty((n, m))
+    sxx = _np.empty((n, m))
+    syy = _np.empty((n, m))
+    sxy = _np.empty((n, m))
+    for i in _prange(n):
+        for j in range(m):
+            c = 0.0; a = 0.0; b = 0.0; aa = 0.0; bb = 0.0; ab = 0.0
+            for t in range(k):
+                valid = wa[i, t] * wb[j, t]
+                x = xa[i, t] * wb[j, t]
+                y = xb[j, t] * wa[i, t]
+                c += valid
+                a += x
+                b += y
+                aa += x * x
+                bb += y * y
+                ab += x * y
+            n_obs[i, j] = c; sx[i, j] = a; sy[i, j] = b
+            sxx[i, j] = aa; syy[i, j] = bb; sxy[i, j] = ab
+    return n_obs, sx, sy, sxx, syy, sxy
+
+def _pairwise_complete(A, B, transform, low_memory=False, block_size=None, dtype=_np.float64):
+    """Correlation over pairwise-complete observations, and the number of observations per pair.
+
+    The co-moments are masked sums: with `x`/`w` the centred values/masks, e.g., `sum(x*y)` over
+    shared observations is `xa @ xb.T` and `sum(x)` is `xa @ wb.T`. These are computed per
+    row-block of `A`, so that temporaries are bounded to (block_size x m).
+    """
+    xa, wa = _masked_centre(transform(A), dtype)
+    if B is None or B is A:
+        xb, wb = xa, wa
     else:
-        return _pearson_numba(rank(A), rank(B), low_memory=low_memory)
+        xb, wb = _masked_centre(transform(B), dtype)
+    n = xa.shape[0]
+    m = xb.shape[0]
+    block_size = _block_size(xa.shape[1], block_size=block_size)
+    corr = _np.empty((n, m), dtype=dtype)
+    n_obs = _np.empty((n, m), dtype=_np.int64)
+    for i0 in range(0, n, block_size):
+        rows = slice(i0, min(i0 + block_size, n))
+        if low_memory:
+            c, sx, sy, sxx, syy, sxy = _pairwise_sums(xa[rows], wa[rows], xb, wb)
+        else:
+            c = wa[rows] @ wb.T
+            sx = xa[rows] @ wb.T
+            sy = wa[rows] @ xb.T
+            sxx = (xa[rows] ** 2) @ wb.T
+            syy = wa[rows] @ (xb ** 2).T
+            sxy = xa[rows] @ xb.T
+        with _np.errstate(divide='ignore', invalid='ignore'):
+            cov = sxy - sx * sy / c
+            var = (sxx - sx**2 / c) * (syy - sy**2 / c)
+            tile = cov / _np.sqrt(var)
+        tile[c < 2] = _np.nan
+        corr[rows] = _np.clip(tile, -1.0, 1.0)
+        n_obs[rows] = c
+    return corr, n_obs
+
+@_jit(nopython=True)
+def _rank_into(values, out):
+    """Average (1-based) ranks of a 1D array of (non-NaN) `values`, written into `out`."""
+    k = len(values)
+    order = _np.argsort(values)
+    j = 0
+    while j < k:
+        t = j + 1
+        while t < k and values[order[t]] == values[order[j]]:
+            t += 1
+        avg = (j + t + 1) / 2.0
+        for u in range(j, t):
+            out[order[u]] = avg
+        j = t
+
+@_jit(nopython=True, parallel=True)
+def _rerank_pairwise(A, B, has_nan_a, has_nan_b, corr, symmetric):
+    """Spearman's correlation of the pairs with a missing value, re-ranked over the observations
+    present in both rows (in place). Per-thread buffers are reused across pairs."""
+    n, k = A.shape
+    m = B.shape[0]
+    for i in _prange(n):
+        x = _np.empty(k)
+        y = _np.empty(k)
+        rx = _np.empty(k)
+        ry = _np.empty(k)
+        for j in range(i if symmetric else 0, m):
+            if not (has_nan_a[i] or has_nan_b[j]):
+                continue
+            c = 0
+            for t in range(k):
+                if not (_np.isnan(A[i, t]) or _np.isnan(B[j, t])):
+                    x[c] = A[i, t]
+                    y[c] = B[j, t]
+                    c += 1
+            if c < 2:
+                corr[i, j] = _np.nan
+                continue
+            _rank_into(x[:c], rx[:c])
+            _rank_into(y[:c], ry[:c])
+            mu = (c + 1) / 2.0
+            sxy = 0.0
+            sxx = 0.0
+            syy = 0.0
+            for t in range(c):
+                dx = rx[t] - mu
+                dy = ry[t] - mu
+                sxy += dx * dy
+                sxx += dx * dx
+                syy += dy * dy
+            corr[i, j] = sxy / _np.sqrt(sxx * syy) if sxx > 0 and syy > 0 else _np.nan
+            if symmetric:
+                corr[j, i] = corr[i, j]
+
+def _is_sparse(mat):
+    """Whether `mat` is a `scipy.sparse` matrix/array, without importing scipy if it is not loaded."""
+    sparse = _sys.modules.get('scipy.sparse')
+    return sparse is not None and sparse.issparse(mat)
+
+@_jit(nopython=True, parallel=True)
+def _sparse_average_ranks(data, indptr, order, n_cols, dtype=_np.float64):
+    """Average ranks of the stored values of a CSR matrix (without explicit zeros), where the
+    implicit zeros of a row are a single run of ties. Ranks are shifted by the rank of the zeros,
+    so that zeros keep a rank of 0 (and the sparsity pattern is preserved); this shift does not
+    change the correlation. `order` sorts the values within each row."""
+    n = len(indptr) - 1
+    out = _np.empty(len(data), dtype=dtype)
+    for i in _prange(n):
+        start, stop = indptr[i], indptr[i + 1]
+        n_zeros = n_cols - (stop - start)
+        n_negatives = 0
+        for p in range(start, stop):
+            if data[p] < 0:
+                n_negatives += 1
+        zero_rank = n_negatives + (n_zeros + 1) / 2.0
+        position = 0  # number of values (including zeros) ranked before the current run
+        j = start
+        while j < stop:
+            value = data[order[j]]
+            if value > 0 and position == n_negatives:
+                position += n_zeros
+            t = j + 1
+            while t < stop and data[order[t]] == value:
+                t += 1
+            avg = position + (t - j + 1) / 2.0
+            for u in range(j, t):
+                out[order[u]] = avg - zero_rank
+            position += t - j
+            j = t
+    return out
+
+def _sparse_rank(mat, dtype=_np.float64):
+    """Row-wise (shifted) average ranks of a sparse matrix, see `_sparse_average_ranks`."""
+    mat = mat.tocsr(copy=True)
+    mat.eliminate_zeros()
+    rows = _np.repeat(_np.arange(mat.shape[0]), _np.diff(mat.indptr))
+    order = _np.lexsort((mat.data, rows))
+    mat.data = _sparse_average_ranks(mat.data, mat.indptr, order, mat.shape[1], dtype)
+    return mat
+
+def _sparse_correlation(A, B, ranked=False, dtype=_np.float64):
+    """Pearson's (or Spearman's) correlation of sparse matrices, from sparse cross-products
+    that are corrected by the means (i.e., `sum(xy) - k * mu_x * mu_y`). Inputs are never densified."""
+    from scipy import sparse
+
+    symmetric = B is None or B is A
+    prepare = _partial(_sparse_rank, dtype=dtype) if ranked else (lambda mat: sparse.csr_array(mat, dtype=dtype))
+    xa = prepare(sparse.csr_array(A))
+    xb = xa if symmetric else prepare(sparse.csr_array(B))
+    k = xa.shape[1]
+    assert xb.shape[1] == k, '`A` and `B` must have the same number of columns'
+
+    def moments(mat):
+        mu = _np.asarray(mat.sum(axis=1), dtype=_np.float64).ravel() / k
+        ss = _np.asarray(mat.multiply(mat).sum(axis=1), dtype=_np.float64).ravel() - k * mu**2
+        return mu, _np.sqrt(ss)
+
+    mu_a, sd_a = moments(xa)
+    mu_b, sd_b = (mu_a, sd_a) if symmetric else moments(xb)
+    cross = (xa @ xb.T).toarray()
+    with _np.errstate(divide='ignore', invalid='ignore'):
+        corr = (cross - k * _np.outer(mu_a, mu_b)) / _np.outer(sd_a, sd_b)
+    return _np.clip(corr, -1.0, 1.0).astype(dtype, copy=False)
+
+def pearson(A, B=None, low_memory=False, n_threads=None, out=None, block_size=None, max_memory=None, condensed=False, nan_policy='propagate', dtype=None):
+    """Row-wise Pearson's correlation between `A` and `B` (or `A` with itself).
+
+    If any of `out`, `block_size` or `max_memory` is given, the correlation is computed tile
+    by tile (row-blocks of `A` against row-blocks of `B`) and streamed into `out`, so that
+    only the inputs (which can be memory-mapped themselves) and one tile are held in memory.
+
+    Self-correlations (i.e., `B=None`) are standardized once and only the upper triangle is
+    computed (a symmetric BLAS product, or tiles on and above the diagonal) and then mirrored.
+
+    Args:
+        A (np.ndarray): An (n x k) matrix, rows are variables and columns are observations.
+        B (np.ndarray, optional): An (m x k) matrix. Defaults to None (i.e., `B=A`).
+        low_memory (bool, optional): Compute pairs one by one instead of a single matrix product.
+            Defaults to False.
+        n_threads (int, optional): Number of threads of the numba kernels.
+            Defaults to None (i.e., `configs.numba.n_threads`).
+        out (str, Path, np.ndarray, optional): Receives the tiles. A path creates an `.npy` file
+            that is opened as a `np.memmap`. Defaults to None (i.e., an in-memory array).
+        block_size (int, optional): Number of rows per tile. Defaults to None.
+        max_memory (int, optional): Approximate memory (in bytes) of a single tile, used to
+            derive the `block_size`. Defaults to None (i.e., 1024 rows per tile).
+        condensed (bool, optional): For self-correlations, return only the strictly upper
+            triangle as a condensed vector, compatible with `scipy.spatial.distance.squareform`.
+            The vector is filled tile by tile. Defaults to False.
+        nan_policy (str, optional): `propagate` returns NaN for any row that contains a NaN,
+            `omit` correlates each pair over the observations present in both rows
+            (i.e., pairwise-complete observations) and also returns the number of
+            observations used per pair; `out`, `max_memory` and `condensed` are not
+            supported in this mode. Defaults to 'propagate'.
+            `scipy.sparse` inputs are correlated via sparse cross-products (without being
+            densified) and only support the default arguments.
+        dtype (np.dtype, optional): The dtype of the computations and the result, e.g.,
+            `np.float32` halves the memory footprint and bandwidth (row statistics are still
+            accumulated in float64). Defaults to None (i.e., float32 if the inputs are float32,
+            otherwise float64).
+
+    Returns:
+        np.ndarray: An (n x m) matrix (or a condensed vector) of correlation coefficients.
+            For `nan_policy='omit'`, a tuple of the (n x m) coefficients and (n x m) counts.
+    """
+    assert nan_policy in ('propagate', 'omit'), f'Unknown `nan_policy`: {nan_policy}'
+    dtype = _float_dtype(A, dtype)
+    if _is_sparse(A) or _is_sparse(B):
+        assert nan_policy == 'propagate' and not condensed and out is None and block_size is None and max_memory is None, \
+            'Sparse inputs only support the default arguments'
+        return _sparse_correlation(A, B, ranked=False, dtype=dtype)
+    with _num_threads(n_threads):
+        if nan_policy == 'omit':
+            assert out is None and max_memory is None and not condensed, \
+                "`nan_policy='omit'` does not support `out`, `max_memory` or `condensed`"
+            return _pairwise_complete(A, B, _np.asarray, low_memory=low_memory, block_size=block_size, dtype=dtype)
+        if out is not None or block_size is not None or max_memory is not None or condensed:
+            return _correlate_tiled(A, B, _standardize, out=out, block_size=block_size, max_memory=max_memory, condensed=condensed, dtype=dtype)
+        za = _standardize(A, dtype)
+        zb = None if B is None or B is A else _standardize(B, dtype)
+        return _correlate(za, zb, low_memory=low_memory)
+
+def spearman(A, B=None, low_memory=False, n_threads=None, out=None, block_size=None, max_memory=None, condensed=False, nan_policy='propagate', dtype=None):
+    """Row-wise Spearman's correlation, see `pearson` for the arguments.
+
+    For `nan_policy='omit'`, pairs of complete rows are correlated from their ranks via masked
+    sums (see `pearson`), while the pairs with a missing value are re-ranked over the
+    observations present in both rows (as `pd.DataFrame.corr(method='spearman')`).
+
+    For `scipy.sparse` inputs, the implicit zeros of each row share a single (tied) rank, and
+    ranks are shifted such that zeros stay zero, so the ranked matrix is as sparse as the input.
+    """
+    assert nan_policy in ('propagate', 'omit'), f'Unknown `nan_policy`: {nan_policy}'
+    dtype = _float_dtype(A, dtype)
+    if _is_sparse(A) or _is_sparse(B):
+        assert nan_policy == 'propagate' and not condensed and out is None and block_size is None and max_memory is None, \
+            'Sparse inputs only support the default arguments'
+        with _num_threads(n_threads):
+            return _sparse_correlation(A, B, ranked=True, dtype=dtype)
+    with _num_threads(n_threads):
+        if nan_policy == 'omit':
+            assert out is None and max_memory is None and not condensed, \
+                "`nan_policy='omit'` does not support `out`, `max_memory` or `condensed`"
+            corr, n_obs = _pairwise_complete(A, B, _partial(rank, dtype=dtype), low_memory=low_memory, block_size=block_size, dtype=dtype)
+            symmetric = B is None or B is A
+            A = _np.asarray(A)
+            B = A if symmetric else _np.asarray(B)
+            has_nan_a = _np.isnan(A).any(axis=1)
+            has_nan_b = has_nan_a if symmetric else _np.isnan(B).any(axis=1)
+            if has_nan_a.any() or has_nan_b.any():
+                _rerank_pairwise(A, B, has_nan_a, has_nan_b, corr, symmetric)
+            return corr, n_obs
+        if out is not None or block_size is not None or max_memory is not None or condensed:
+            return _correlate_tiled(A, B, _standardize_ranks, out=out, block_size=block_size, max_memory=max_memory, condensed=condensed, dtype=dtype)
+        za = _standardize_ranks(A, dtype)
+        zb = None if B is None or B is A else _standardize_ranks(B, dtype)
+        return _correlate(za, zb, low_memory=low_memory)
+
+def bicor(A, B=None, low_memory=False, n_threads=None, out=None, block_size=None, max_memory=None, condensed=False, dtype=None):
+    """Row-wise biweight midcorrelation (as `WGCNA::bicor`), a median-based correlation that is
+    robust to outliers, see `pearson` for the arguments.
+
+    Each row is weighted once by Tukey's biweight of its deviations from the median (in units of
+    `9 * MAD`) and scaled to unit norm; the coefficients are then a single matrix product (or
+    computed tile by tile), as for `pearson`. Rows with a NaN get NaN coefficients.
+    """
+    dtype = _float_dtype(A, dtype)
+    with _num_threads(n_threads):
+        if out is not None or block_size is not None or max_memory is not None or condensed:
+            return _correlate_tiled(A, B, _standardize_biweight, out=out, block_size=block_size, max_memory=max_memory, condensed=condensed, dtype=dtype)
+        za = _standardize_biweight(A, dtype)
+        zb = None if B is None or B is A else _standardize_biweight(B, dtype)
+        return _correlate(za, zb, low_memory=low_memory)
         
 
-if __name__ == '__main__':
-    from scipy import stats
-    import pandas as pd
-    import timeit
-
-    _np.random.seed([3, 1415])
-    A = _np.random.randn(200, 1000)
-    B = _np.random.randn(200, 1000)
-
-    funcs = {
-        'numba_lm0': lambda: _pearson_numba(A, A, low_memory=False),
-        'numba_lm1': lambda: _pearson_numba(A, A, low_memory=True),
-        'my_numpy':  lambda: _pearson_numpy(A, A),
-        'np_coef':   lambda: _np.corrcoef(A),
-        'pd_coef':   lambda: pd.DataFrame(A.T).corr(method='pearson'),
-        'scipy_coef':   lambda: stats.pearsonr(A.T).statistic,  # only supports 1D arrays
-    }
-
-    for i, (name, func) in enumerate(funcs.items()):
-        if i == 0:
-            res = func()
+_TRANSFORMS = {
+    'pearson': _standardize,
+    'spearman': _standardize_ranks,
+    'bicor': _standardize_biweight,
+}
+
+def top_k(A, B=None, k=10, method='spearman', absolute=True, exclude_self=True, block_size=None, max_memory=None, n_threads=None, dtype=None):
+    """The `k` most correlated partners (rows of `B`) of each row of `A`.
+
+    The correlation is computed tile by tile (see `pearson`), and only the best `k` candidates
+    per row are kept (via `argpartition`), so the (n x m) matrix is never materialized.
+
+    Args:
+        A (np.ndarray): An (n x p) matrix, rows are variables and columns are observations.
+        B (np.ndarray, optional): An (m x p) matrix. Defaults to None (i.e., `B=A`).
+        k (int, optional): Number of partners per row. Defaults to 10.
+        method (str, optional): `pearson`, `spearman` or `bicor`. Defaults to 'spearman'.
+        absolute (bool, optional): Rank partners by the absolute (rather than signed)
+            correlation. Defaults to True.
+        exclude_self (bool, optional): For self-correlations, skip the row itself.
+            Defaults to True.
+        block_size, max_memory, n_threads, dtype: See `pearson`.
+
+    Returns:
+        tuple: (n x k) indices of the partners in `B`, and (n x k) signed correlations,
+            both ordered from the strongest to the weakest partner.
+    """
+    assert method in _TRANSFORMS, f'Unknown correlation method: {method}'
+    symmetric = B is None or B is A
+    if symmetric:
+        B = A
+    n = A.shape[0]
+    k = min(k, B.shape[0] - int(symmetric and exclude_self))
+    dtype = _float_dtype(A, dtype)
+    block_size = _block_size(A.shape[1], block_size=block_size, max_memory=max_memory, itemsize=dtype.itemsize)
+    transform = _partial(_TRANSFORMS[method], dtype=dtype)
+    indices = _np.empty((n, k), dtype=_np.int64)
+    values = _np.empty((n, k), dtype=dtype)
+
+    def select(idx, val, rows):
+        score = _np.abs(val) if absolute else val.copy()
+        score[_np.isnan(score)] = -_np.inf
+        if symmetric and exclude_self:
+            score[idx == _np.arange(rows.start, rows.stop)[:, None]] = -_np.inf
+        if score.shape[1] <= k:  # fewer candidates than `k` so far (e.g., `block_size < k`)
+            return idx, val
+        best = _np.argpartition(-score, k - 1, axis=1)[:, :k]
+        return _np.take_along_axis(idx, best, axis=1), _np.take_along_axis(val, best, axis=1)
+
+    with _num_threads(n_threads):
+        rows = None
+        for tile_rows, cols, tile in _iter_tiles(A, B, transform, block_size):
+            col_idx = _np.broadcast_to(_np.arange(cols.start, cols.stop), tile.shape)
+            if tile_rows != rows:
+                rows = tile_rows
+                best_idx = _np.empty((tile.shape[0], 0), dtype=_np.int64)
+                best_val = _np.empty((tile.shape[0], 0), dtype=dtype)
+            best_idx, best_val = select(
+                _np.concatenate([best_idx, col_idx], axis=1),
+                _np.concatenate([best_val, tile], axis=1),
+                rows,
+            )
+            if cols.stop == B.shape[0]:
+                score = _np.abs(best_val) if absolute else best_val
+                order = _np.argsort(-_np.nan_to_num(score, nan=-_np.inf), axis=1, kind='stable')
+                indices[rows] = _np.take_along_axis(best_idx, order, axis=1)
+                values[rows] = _np.take_along_axis(best_val, order, axis=1)
+    return indices, values
+
+def permutation_test(A, B=None, method='spearman', n_permutations=1000, alternative='two-sided', seed=None, batch_size=None, max_memory=None, n_threads=None, dtype=None):
+    """Empirical p-values of row-wise correlations, by permuting the observations of `A`.
+
+    Both inputs are ranked and standardized once; a permutation of the (standardized)
+    columns keeps rows standardized, so a batch of permutations is a single matrix product
+    `za[:, perms] @ zb.T`. Batches are processed by `n_threads` threads (the products
+    release the GIL), and each batch draws its permutations from its own child generator of
+    the `seed` (`np.random.SeedSequence.spawn`), so the results only depend on the `seed` and
+    `batch_size` (not on the threads), and only the permutations of the batches in progress are
+    held in memory.
+
+    Args:
+        A (np.ndarray): An (n x k) matrix, rows are variables and columns are observations.
+        B (np.ndarray, optional): An (m x k) matrix. Defaults to None (i.e., `B=A`).
+        method (str, optional): `pearson`, `spearman` or `bicor`. Defaults to 'spearman'.
+        n_permutations (int, optional): Number of permutations. Defaults to 1000.
+        alternative (str, optional): `two-sided`, `greater` or `less`. Defaults to 'two-sided'.
+        seed (int, optional): Seed of the random generator. Defaults to None.
+        batch_size (int, optional): Number of permutations per matrix product. Defaults to None
+            (i.e., as many as fit in `max_memory`, or 64 permutations).
+        max_memory (int, optional): Approximate memory (in bytes) of a single batch.
+            Defaults to None.
+        n_threads, dtype: See `pearson`.
+
+    Returns:
+        tuple: (n x m) correlations and their (n x m) p-values, `(1 + #extreme) / (1 + n_permutations)`;
+            NaN where the correlation is undefined (e.g., a constant row).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    assert method in _TRANSFORMS, f'Unknown correlation method: {method}'
+    assert alternative in ('two-sided', 'greater', 'less'), f'Unknown `alternative`: {alternative}'
+    dtype = _float_dtype(A, dtype)
+    with _num_threads(n_threads):
+        za = _TRANSFORMS[method](A, dtype)
+        zb = za if B is None or B is A else _TRANSFORMS[method](B, dtype)
+    observed = za @ zb.T
+    n, k = za.shape
+    m = zb.shape[0]
+    if batch_size is None:
+        batch_size = 64 if max_memory is None else max_memory // (dtype.itemsize * n * (k + m))
+    batch_size = int(max(1, min(batch_size, n_permutations)))
+    tolerance = 100 * _np.finfo(dtype).eps
+    if alternative == 'two-sided':
+        threshold = _np.abs(observed) - tolerance
+    elif alternative == 'greater':
+        threshold = observed - tolerance
+    else:
+        threshold = -observed - tolerance
+
+    def count_extremes(batch):
+        n_batch, seed_sequence = batch
+        perms = _np.random.default_rng(seed_sequence).permuted(_np.tile(_np.arange(k), (n_batch, 1)), axis=1)
+        null = (za[:, perms].reshape(n * n_batch, k) @ zb.T).reshape(n, n_batch, m)
+        if alternative == 'two-sided':
+            null = _np.abs(null)
+        elif alternative == 'less':
+            null = -null
+        return (null >= threshold[:, None, :]).sum(axis=1)
+
+    sizes = [min(batch_size, n_permutations - start) for start in range(0, n_permutations, batch_size)]
+    batches = zip(sizes, _np.random.SeedSequence(seed).spawn(len(sizes)))
+    n_workers = n_threads if n_threads is not None else (_configs.numba.n_threads or 1)
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        n_extremes = sum(executor.map(count_extremes, batches))
+    pvalues = (1 + n_extremes) / (1 + n_permutations)
+    pvalues[~_np.isfinite(observed)] = _np.nan
+    return observed, pvalues
+
+def _correlation_pvalues(corr, n_obs):
+    """Two-sided p-values of the t-test of correlations (as in `scipy.stats.pearsonr`/`spearmanr`).
+    With `df = n_obs - 2`, `P(|T| >= |t|)` equals the regularized incomplete beta `I_{1 - r**2}(df/2, 1/2)`."""
+    from scipy import special
+
+    r2 = _np.clip(_np.asarray(corr, dtype=_np.float64) ** 2, 0.0, 1.0)
+    with _np.errstate(divide='ignore', invalid='ignore'):
+        return special.betainc((n_obs - 2) / 2.0, 0.5, 1.0 - r2)
+
+def _bh_qvalues(pvalues, n_tests=None):
+    """Benjamini-Hochberg q-values of a 1D array of p-values; NaN p-values are not counted as
+    tests and keep a NaN q-value. `n_tests` (the number of finite tests) can exceed the number
+    of given p-values, if these are the smallest of all tests."""
+    finite = _np.isfinite(pvalues)
+    n_tests = int(finite.sum()) if n_tests is None else n_tests
+    pvalues = pvalues[finite]
+    order = _np.argsort(pvalues, kind='stable')
+    qvalues = pvalues[order] * n_tests / _np.arange(1, len(pvalues) + 1)
+    qvalues = _np.minimum.accumulate(qvalues[::-1])[::-1]
+    out = _np.full(finite.shape, _np.nan)
+    out[_np.flatnonzero(finite)[order]] = _np.clip(qvalues, 0.0, 1.0)
+    return out
+
+def correlation_test(A, B=None, method='spearman', alpha=None, block_size=None, max_memory=None, n_threads=None, dtype=None):
+    """Row-wise correlations with their (t-distribution) p-values and Benjamini-Hochberg q-values.
+
+    Args:
+        A (np.ndarray): An (n x k) matrix, rows are variables and columns are observations.
+        B (np.ndarray, optional): An (m x k) matrix. Defaults to None (i.e., `B=A`).
+        method (str, optional): `pearson`, `spearman` or `bicor`. Defaults to 'spearman'.
+        alpha (float, optional): If given, the correlation is computed tile by tile and only the
+            pairs with a q-value <= `alpha` are returned as sparse (COO) matrices. Only p-values
+            <= `alpha` are kept between tiles, which suffices to get their exact q-values.
+            For self-correlations, only the upper triangle (without diagonal) is returned.
+            Defaults to None (i.e., dense matrices).
+        block_size, max_memory, n_threads, dtype: See `pearson`.
+
+    Returns:
+        tuple: The correlations, p-values and q-values, either as dense (n x m) arrays or as
+            `scipy.sparse.coo_array` with identical coordinates. For self-correlations, the
+            FDR is controlled over the unique pairs (i.e., the upper triangle).
+    """
+    assert method in _TRANSFORMS, f'Unknown correlation method: {method}'
+    symmetric = B is None or B is A
+    dtype = _float_dtype(A, dtype)
+    n, k = A.shape
+    m = n if symmetric else B.shape[0]
+
+    if alpha is None:
+        correlate = {'pearson': pearson, 'spearman': spearman, 'bicor': bicor}[method]
+        corr = correlate(A, B, n_threads=n_threads, dtype=dtype)
+        pvalues = _correlation_pvalues(corr, k)
+        if symmetric:
+            upper = _np.triu_indices(n, k=1)
+            qvalues = _np.zeros((n, n))
+            qvalues[upper] = _bh_qvalues(pvalues[upper])
+            qvalues.T[upper] = qvalues[upper]
+            _np.fill_diagonal(qvalues, _np.diag(pvalues))
+        else:
+            qvalues = _bh_qvalues(pvalues.ravel()).reshape(n, m)
+        return corr, pvalues, qvalues
+
+    from scipy import sparse
+
+    block_size = _block_size(k, block_size=block_size, max_memory=max_memory, itemsize=dtype.itemsize)
+    transform = _partial(_TRANSFORMS[method], dtype=dtype)
+    rows, cols, corrs, pvals = [], [], [], []
+    n_tests = 0
+    with _num_threads(n_threads):
+        for tile_rows, tile_cols, tile in _iter_tiles(A, A if symmetric else B, transform, block_size, upper=symmetric):
+            ptile = _correlation_pvalues(tile, k)
+            tested = _np.isfinite(ptile)
+            if symmetric and tile_rows == tile_cols:
+                tested &= _np.triu(_np.ones(tile.shape, dtype=bool), k=1)
+            n_tests += int(tested.sum())
+            i, j = _np.nonzero(tested & (ptile <= alpha))
+            rows.append(i + tile_rows.start)
+            cols.append(j + tile_cols.start)
+            corrs.append(tile[i, j])
+            pvals.append(ptile[i, j])
+    rows, cols, corrs, pvals = (_np.concatenate(arr) for arr in (rows, cols, corrs, pvals))
+    qvals = _bh_qvalues(pvals, n_tests=n_tests)
+    keep = qvals <= alpha
+    coords = (rows[keep], cols[keep])
+    return tuple(
+        sparse.coo_array((values[keep], coords), shape=(n, m))
+        for values in (corrs, pvals, qvals)
+    )
+
+@_jit(nopython=True, parallel=True)
+def _dense_ranks(mat, order):
+    """Row-wise dense ranks (0, 1, ...; ties share a rank) and the number of tied pairs per row."""
+    n, k = order.shape
+    out = _np.empty((n, k), dtype=_np.int64)
+    n_ties = _np.zeros(n, dtype=_np.int64)
+    for i in _prange(n):
+        r = 0
+        run = 1
+        out[i, order[i, 0]] = 0
+        for j in range(1, k):
+            if mat[i, order[i, j]] != mat[i, order[i, j - 1]]:
+                r += 1
+                n_ties[i] += run * (run - 1) // 2
+                run = 1
+            else:
+                run += 1
+            out[i, order[i, j]] = r
+        n_ties[i] += run * (run - 1) // 2
+    return out, n_ties
+
+@_jit(nopython=True)
+def _merge_sort_count(values, buffer):
+    """Sorts `values` in place (bottom-up, stable merge sort) and returns the number of
+    inversions, i.e., pairs `p < q` with `values[p] > values[q]` (ties are not counted)."""
+    k = len(values)
+    n_swaps = 0
+    src, dst = values, buffer
+    width = 1
+    while width < k:
+        for lo in range(0, k, 2 * width):
+            mid = min(lo + width, k)
+            hi = min(lo + 2 * width, k)
+            p, q, t = lo, mid, lo
+            while p < mid and q < hi:
+                if src[q] < src[p]:
+                    dst[t] = src[q]
+                    n_swaps += mid - p
+                    q += 1
+                else:
+                    dst[t] = src[p]
+                    p += 1
+                t += 1
+            while p < mid:
+                dst[t] = src[p]
+                p += 1
+                t += 1
+            while q < hi:
+                dst[t] = src[q]
+                q += 1
+                t += 1
+        src, dst = dst, src
+        width *= 2
+    if src is not values:
+        values[:] = src
+    return n_swaps
+
+@_jit(nopython=True, parallel=True)
+def _kendall_pairs(rx, order_x, ties_x, ry, ties_y, symmetric):
+    """Kendall's tau-b of all row pairs in O(k log k) per pair (Knight's algorithm): pairs are
+    sorted by (x, y), after which the discordant pairs are the inversions (swaps) of y."""
+    n, k = rx.shape
+    m = ry.shape[0]
+    n_pairs = k * (k - 1) // 2
+    out = _np.empty((n, m))
+    for i in _prange(n):
+        keys = _np.empty(k, dtype=_np.int64)
+        ys = _np.empty(k, dtype=_np.int64)
+        buffer = _np.empty(k, dtype=_np.int64)
+        for j in range(i if symmetric else 0, m):
+            for t in range(k):
+                keys[t] = rx[i, order_x[i, t]] * k + ry[j, order_x[i, t]]
+            if ties_x[i] > 0:  # otherwise, keys are already sorted by `x` alone
+                _merge_sort_count(keys, buffer)
+            n_joint = 0
+            run = 1
+            for t in range(1, k):
+                if keys[t] == keys[t - 1]:
+                    run += 1
+                else:
+                    n_joint += run * (run - 1) // 2
+                    run = 1
+            n_joint += run * (run - 1) // 2
+            for t in range(k):
+                ys[t] = keys[t] % k
+            n_discordant = _merge_sort_count(ys, buffer)
+            numerator = n_pairs - ties_x[i] - ties_y[j] + n_joint - 2 * n_discordant
+            denominator = _np.sqrt(float(n_pairs - ties_x[i])) * _np.sqrt(float(n_pairs - ties_y[j]))
+            out[i, j] = numerator / denominator if denominator > 0 else _np.nan
+            if symmetric:
+                out[j, i] = out[i, j]
+    return out
+
+def kendall(A, B=None, n_threads=None):
+    """Row-wise Kendall's tau-b between `A` and `B` (or `A` with itself), equivalent to
+    `scipy.stats.kendalltau` for every pair of rows, but in O(k log k) per pair (merge sort
+    inversion counting) and in parallel over pairs.
+
+    Args:
+        A (np.ndarray): An (n x k) matrix, rows are variables and columns are observations.
+        B (np.ndarray, optional): An (m x k) matrix. Defaults to None (i.e., `B=A`).
+        n_threads (int, optional): See `pearson`.
+
+    Returns:
+        np.ndarray: An (n x m) matrix of tau-b coefficients; NaN for the pairs that involve
+            a row with a NaN (as `scipy.stats.kendalltau` with `nan_policy='propagate'`).
+    """
+    symmetric = B is None or B is A
+    A = _np.asarray(A)
+    assert symmetric or A.shape[1] == _np.shape(B)[1], '`A` and `B` must have the same number of columns'
+    with _num_threads(n_threads):
+        order_x = _np.argsort(A, axis=1, kind='stable')
+        rx, ties_x = _dense_ranks(A, order_x)
+        if symmetric:
+            ry, ties_y = rx, ties_x
+        else:
+            B = _np.asarray(B)
+            ry, ties_y = _dense_ranks(B, _np.argsort(B, axis=1, kind='stable'))
+        out = _kendall_pairs(rx, order_x, ties_x, ry, ties_y, symmetric)
+    # NaNs are sorted last and would be ranked as distinct values
+    out[_np.isnan(A).any(axis=1)] = _np.nan
+    out[:, _np.isnan(A if symmetric else B).any(axis=1)] = _np.nan
+    return out
+
+def precompile(dtypes=(_np.float32, _np.float64)):
+    """Compiles (and caches on disk) all numba kernels of this module for the given dtypes ahead
+    of time, e.g., once after installation or before timing a job, instead of on their first
+    call. The kernels are warmed through every code path that uses them (e.g., `low_memory`,
+    `condensed`, `nan_policy='omit'`, sparse inputs), as well as the public kernels themselves.
+    """
+    try:
+        from scipy import sparse
+    except ImportError:  # sparse inputs are not available either
+        sparse = None
+
+    for dtype in dtypes:
+        dtype = _np.dtype(dtype)
+        mat = _np.arange(24, dtype=dtype).reshape(4, 6) % 5
+        mat_nan = mat.copy()
+        mat_nan[0, 0] = _np.nan
+        mean(mat, dtype.type)
+        std(mat, dtype.type)
+        rank(mat, method='ordinal', dtype=dtype)
+        for low_memory in [False, True]:
+            _pearson_numba(mat, mat[:2], low_memory, dtype.type)
+            for correlate in [pearson, spearman, bicor]:
+                correlate(mat, low_memory=low_memory)
+                correlate(mat, mat[:2], low_memory=low_memory)
+            for correlate in [pearson, spearman]:
+                correlate(mat_nan, nan_policy='omit', low_memory=low_memory)
+                correlate(mat_nan, mat_nan[:2], nan_policy='omit', low_memory=low_memory)
+        for correlate in [pearson, spearman, bicor]:
+            correlate(mat, condensed=True)
+        kendall(mat)
+        kendall(mat, mat[:2])
+        if sparse is not None:
+            spearman(sparse.csr_array(mat), sparse.csr_array(mat[:2]))
+
+# arrays attached by the worker processes of `correlate_sharded`, by their role (e.g., `za`)
+_SHARED = {}
+
+def _attach_shared(name, shape, dtype):
+    """Attaches to an existing shared memory block, without tracking it in this (worker) process;
+    otherwise a tracker of the worker may unlink it when the worker exits."""
+    from multiprocessing import shared_memory
+
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        from multiprocessing import resource_tracker
+
+        # spawned/forked workers share the tracker of the parent (which unlinks the block);
+        # unregistering there would drop the registration of the parent
+        shares_tracker = getattr(resource_tracker._resource_tracker, '_fd', None) is not None
+        shm = shared_memory.SharedMemory(name=name)
+        if not shares_tracker:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm, _np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _shard_initializer(specs, n_threads=1):
+    from threadpoolctl import threadpool_limits
+
+    # each worker is one of many processes, its BLAS pool should not claim every core
+    threadpool_limits(limits=n_threads)
+    for role, (kind, location, shape, dtype) in specs.items():
+        if kind == 'shm':
+            _SHARED[role] = _attach_shared(location, shape, dtype)
+        else:
+            _SHARED[role] = (None, _np.load(location, mmap_mode='r+'))
+
+def _shard_task(i0, i1, symmetric):
+    """Correlates rows `[i0, i1)` and writes them (and their mirror) into the shared output."""
+    za = _SHARED['za'][1]
+    zb = za if symmetric else _SHARED['zb'][1]
+    out = _SHARED['out'][1]
+    if symmetric:
+        tile = za[i0:i1] @ za[i0:].T
+        out[i0:i1, i0:] = tile
+        out[i0:, i0:i1] = tile.T
+    else:
+        out[i0:i1] = za[i0:i1] @ zb.T
+    return i0, i1
+
+def correlate_sharded(A, B=None, method='spearman', n_workers=None, block_size=None, out=None, n_threads=None, dtype=None):
+    """Row-wise correlation, sharded over worker processes.
+
+    Inputs are ranked/standardized once in this process and copied into
+    `multiprocessing.shared_memory`, which the workers attach to. Each worker correlates
+    row-blocks of `A` and writes them into a shared output (or an `.npy` memmap), so no large
+    array is pickled between processes. For self-correlations, a block of rows is only
+    correlated with itself and the rows below it, and then mirrored.
+
+    Args:
+        A (np.ndarray): An (n x k) matrix, rows are variables and columns are observations.
+        B (np.ndarray, optional): An (m x k) matrix. Defaults to None (i.e., `B=A`).
+        method (str, optional): `pearson`, `spearman` or `bicor`. Defaults to 'spearman'.
+        n_workers (int, optional): Number of worker processes. Defaults to None (i.e., the
+            number of CPUs).
+        block_size (int, optional): Number of rows per task. Defaults to None (i.e., the rows
+            are split into `4 * n_workers` tasks).
+        out (str, Path, optional): Path of an `.npy` file that receives the results (opened as a
+            `np.memmap`). Defaults to None (i.e., an in-memory array).
+        n_threads (int, optional): Number of threads per process, i.e., of the ranking in this
+            process and of the BLAS products in each worker. Defaults to None (i.e.,
+            `configs.numba.n_threads`, or a single thread per worker).
+        dtype: See `pearson`.
+
+    Returns:
+        np.ndarray: An (n x m) matrix of correlation coefficients.
+    """
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    from multiprocessing import shared_memory
+
+    assert method in _TRANSFORMS, f'Unknown correlation method: {method}'
+    symmetric = B is None or B is A
+    dtype = _float_dtype(A, dtype)
+    n_workers = n_workers or os.cpu_count() or 1
+    with _num_threads(n_threads):
+        arrays = {'za': _TRANSFORMS[method](A, dtype)}
+        if not symmetric:
+            arrays['zb'] = _TRANSFORMS[method](B, dtype)
+    n = arrays['za'].shape[0]
+    shape = (n, n if symmetric else arrays['zb'].shape[0])
+    block_size = block_size or max(1, -(-n // (4 * n_workers)))
+
+    blocks = []
+    specs = {}
+    try:
+        for role, arr in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+            blocks.append(shm)
+            _np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+            specs[role] = ('shm', shm.name, arr.shape, arr.dtype)
+        del arrays
+        if out is None:
+            shm = shared_memory.SharedMemory(create=True, size=max(1, int(_np.prod(shape)) * dtype.itemsize))
+            blocks.append(shm)
+            specs['out'] = ('shm', shm.name, shape, dtype)
         else:
-            assert _np.allclose(res, func())
-        elps_time = timeit.timeit(func, number=100)
-        print(f'{name:10}: {elps_time:0.5f}')
-
-# output:
-# numba_lm0 : 3.33725
-# numba_lm1 : 3.28394
-# my_numpy  : 2.61974
-# np_coef   : 0.31122
-# pd_coef   : 6.64400
\ No newline at end of file
+            _np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=shape).flush()
+            specs['out'] = ('npy', str(out), shape, dtype)
+
+        # `spawn`: forking after the numba/BLAS thread pools of this process have started may deadlock
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context, initializer=_shard_initializer, initargs=(specs, n_threads or _configs.numba.n_threads or 1)) as executor:
+            tasks = [
+                executor.submit(_shard_task, i0, min(i0 + block_size, n), symmetric)
+                for i0 in range(0, n, block_size)
+            ]
+            for task in tasks:
+                task.result()
+
+        if out is None:
+            return _np.ndarray(shape, dtype=dtype, buffer=blocks[-1].buf).copy()
+        return _np.load(out, mmap_mode='r+')
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,109 @@
+import numpy as _np
+
+
+class CorrelationAccumulator:
+    """Accumulates the co-moments of row-variables over batches of samples (columns), so that
+    Pearson's correlation can be updated as new samples arrive, instead of being recomputed
+    over the full (growing) matrix.
+
+    Each batch is centred on its own means, and merged via the pairwise update of Chan et al.
+    (a batch-wise Welford), which is numerically stable. Accumulators that ingested different
+    batches (e.g., on different workers) can be merged in the same way.
+
+    Example:
+        acc = CorrelationAccumulator()
+        for batch in batches:  # (n x k_batch) matrices, sharing the same rows
+            acc.update(batch)
+        corr = acc.pearson()  # equivalent to np.corrcoef(np.hstack(batches))
+
+        # distributed
+        acc = CorrelationAccumulator().update(A1, B1).merge(CorrelationAccumulator().update(A2, B2))
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.symmetric = None
+        self.mean_a = None
+        self.mean_b = None
+        self.m2_a = None
+        self.m2_b = None
+        self.comoment = None
+
+    def __repr__(self):
+        shape = None if self.comoment is None else self.comoment.shape
+        return f'{type(self).__name__}(count={self.count}, shape={shape})'
+
+    @staticmethod
+    def _moments(A, B):
+        """Count, means, sums of squared deviations and co-moment of a single batch."""
+        A = _np.asarray(A, dtype=_np.float64)
+        dev_a = A - A.mean(axis=1, keepdims=True)
+        if B is None:
+            dev_b = dev_a
+        else:
+            B = _np.asarray(B, dtype=_np.float64)
+            assert A.shape[1] == B.shape[1], '`A` and `B` must have the same number of samples (columns)'
+            dev_b = B - B.mean(axis=1, keepdims=True)
+        return (
+            A.shape[1],
+            A.mean(axis=1),
+            None if B is None else B.mean(axis=1),
+            (dev_a ** 2).sum(axis=1),
+            None if B is None else (dev_b ** 2).sum(axis=1),
+            dev_a @ dev_b.T,
+        )
+
+    def _combine(self, count, mean_a, mean_b, m2_a, m2_b, comoment, symmetric):
+        if self.count == 0:
+            self.count, self.symmetric = count, symmetric
+            self.mean_a, self.mean_b, self.m2_a, self.m2_b = mean_a, mean_b, m2_a, m2_b
+            self.comoment = comoment
+            return self
+        assert self.symmetric == symmetric, 'Can not combine self-correlations with cross-correlations'
+        assert self.comoment.shape == comoment.shape, (
+            f'Shape mismatch: {self.comoment.shape} vs. {comoment.shape}'
+        )
+
+        total = self.count + count
+        weight = self.count * count / total
+        delta_a = mean_a - self.mean_a
+        delta_b = delta_a if symmetric else mean_b - self.mean_b
+        self.comoment = self.comoment + comoment + _np.outer(delta_a, delta_b) * weight
+        self.m2_a = self.m2_a + m2_a + delta_a ** 2 * weight
+        self.mean_a = self.mean_a + delta_a * count / total
+        if not symmetric:
+            self.m2_b = self.m2_b + m2_b + delta_b ** 2 * weight
+            self.mean_b = self.mean_b + delta_b * count / total
+        self.count = total
+        return self
+
+    def update(self, A, B=None):
+        """Ingests a batch of samples.
+
+        Args:
+            A (np.ndarray): An (n x k_batch) matrix, rows are variables and columns are samples.
+            B (np.ndarray, optional): An (m x k_batch) matrix of the same samples. Defaults to None
+                (i.e., the self-correlation of `A` is accumulated).
+
+        Returns:
+            CorrelationAccumulator: The accumulator itself (to allow chaining).
+        """
+        if _np.shape(A)[1] == 0:
+            return self
+        return self._combine(*self._moments(A, B), symmetric=B is None)
+
+    def merge(self, other):
+        """Merges the co-moments accumulated by `other` (e.g., over other batches) into this one."""
+        if other.count == 0:
+            return self
+        return self._combine(
+            other.count, other.mean_a, other.mean_b, other.m2_a, other.m2_b, other.comoment,
+            symmetric=other.symmetric,
+        )
+
+    def pearson(self):
+        """Pearson's correlation over all samples ingested so far."""
+        assert self.count > 0, 'No samples are accumulated yet'
+        m2_b = self.m2_a if self.symmetric else self.m2_b
+        with _np.errstate(divide='ignore', invalid='ignore'):
+            return self.comoment / _np.sqrt(_np.outer(self.m2_a, m2_b))
@@ -1,16 +1,61 @@
 
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 
 
-def code_natsorted(srs):
+@lru_cache(maxsize=128)
+def _natsorted_dtype(uniques):
+    """An ordered `CategoricalDtype` of the (frozen set of) unique values, in their natural order.
+    Cached, so that columns that are sorted repeatedly (e.g., visits) are only natsorted once.
+
+    Values that share a natural key (e.g., `W1` and `W01`) are ordered by their type and string
+    representation (rather than the iteration order of the set, which depends on the hash seed).
+    """
     from natsort import index_natsorted
 
+    uniques = pd.Index(sorted(uniques, key=lambda value: (type(value).__name__, str(value))))
+    return pd.CategoricalDtype(uniques.take(index_natsorted(uniques)), ordered=True)
+
+def natsorted_dtype(values):
+    """A (cached) ordered `CategoricalDtype` of the unique values, in their natural order.
+
+    The dtype is cached on the set of unique values (with LRU eviction of the least recently
+    used of 128 sets), so it can be reused (e.g., `srs.astype(dtype)`) across repeated sorts,
+    which then only sort the integer codes. Missing values are not part of the categories.
+    """
+    return _natsorted_dtype(frozenset(pd.unique(pd.Series(values).dropna())))
+
+def natsort_categorical(srs):
+    """Encodes the values as an ordered Categorical in their natural order (e.g., `W2 < W11`),
+    which can be used as a key in `sort_values`.
+
+    Only the unique values are natsorted (once), and their order is mapped back to the
+    values via their `pd.factorize` codes, i.e., in O(n + u log(u)) for `u` unique values.
+    The natural order of a set of unique values is cached (see `natsorted_dtype`).
+
+    Example:
+        df.sort_values(by=['col1', 'col2'], key=natsort_categorical)
+
+    Returns:
+        pd.Series: An ordered categorical series, with the index and name of `srs`.
+            Missing values are kept missing.
+    """
     if not isinstance(srs, (pd.core.series.Series, )):
         srs = pd.Series(srs)
 
-    natsort_idx = np.argsort(index_natsorted(srs))
-    return srs.groupby(by=srs).transform(lambda grp: natsort_idx[grp.index].min())
+    codes, uniques = pd.factorize(srs)
+    dtype = _natsorted_dtype(frozenset(uniques))
+    ranks = dtype.categories.get_indexer(uniques)
+    codes = np.where(codes >= 0, ranks.take(codes), -1)
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype), index=srs.index, name=srs.name)
+
+def code_natsorted(srs):
+    """Integer codes of the values in their natural order (see `natsort_categorical`), and NaN
+    for missing values."""
+    codes = natsort_categorical(srs).cat.codes
+    return codes.where(codes >= 0)
 
 if __name__ == '__main__':
     # import numpy as np
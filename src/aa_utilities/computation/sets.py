@@ -1,6 +1,120 @@
+from itertools import chain, islice
+
+import numpy as np
 import pandas as pd
 
-def count_sets_overlap(sequences, names=None, exclusive=False):
+
+def _set_names(sequences, names=None):
+    if names is None:
+        names = [seq.name if hasattr(seq, 'name') else i for (i, seq) in enumerate(sequences)]
+    return names
+
+def _as_series(seq):
+    if not isinstance(seq, (pd.Series, pd.Index, np.ndarray)):
+        seq = list(seq)  # e.g., sets or generators
+    return pd.Series(seq, dtype=object if len(seq) == 0 else None)
+
+def _incidence(sequences):
+    """Encodes the sequences as a sparse (n_sets x n_items) 0/1 matrix over the union of their
+    items, i.e., each row marks the (unique) items of a sequence.
+
+    Returns:
+        tuple: The `scipy.sparse.csr_array` incidence matrix, and the unique items (columns).
+    """
+    from scipy import sparse
+
+    chunks = [_as_series(seq) for seq in sequences]
+    lengths = [len(chunk) for chunk in chunks]
+    items = pd.concat(chunks, ignore_index=True) if chunks else pd.Series([], dtype=object)
+    codes, uniques = pd.factorize(items, use_na_sentinel=False)
+    indptr = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+    incidence = sparse.csr_array(
+        (np.ones(len(codes), dtype=np.int64), codes, indptr),
+        shape=(len(chunks), len(uniques)),
+    )
+    incidence.sum_duplicates()
+    incidence.data[:] = 1  # repeated items are counted once, as in a set
+    return incidence, uniques
+
+def _mix64(values):
+    """The (bijective) splitmix64 finalizer, applied element-wise to uint64 values."""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+def _item_hashes(srs):
+    """64-bit hashes of the items that do not depend on the dtype of the sequence, i.e., items
+    that are equal in the `incidence` engine (e.g., `1`, `1.0` and `np.int8(1)`, in numeric or
+    object sequences) get the same hash: integral numbers are hashed as int64, the other numbers
+    as float64, and anything else (e.g., strings) as objects."""
+    values = srs.to_numpy()
+    if values.dtype.kind == 'b':
+        values = values.astype(np.int64)
+    if values.dtype.kind in 'iu':
+        return pd.util.hash_array(values.astype(np.int64, copy=False))
+    if values.dtype.kind == 'f':
+        values = values.astype(np.float64, copy=False)
+        integral = np.isfinite(values) & (values == np.round(values)) & (np.abs(values) < 2**63)
+        hashes = pd.util.hash_array(values)
+        hashes[integral] = pd.util.hash_array(values[integral].astype(np.int64))
+        return hashes
+    values = values.astype(object, copy=False)
+    # 1: integers within int64 (beyond, they keep their object hash), 2: floats, 0: others
+    kinds = np.fromiter(
+        (
+            1 if isinstance(value, (int, np.integer)) and -2**63 <= value < 2**63
+            else 2 if isinstance(value, (float, np.floating))
+            else 0
+            for value in values
+        ),
+        dtype=np.int8, count=len(values),
+    )
+    hashes = pd.util.hash_array(values)
+    for kind, dtype in [(1, np.int64), (2, np.float64)]:
+        selected = kinds == kind
+        hashes[selected] = _item_hashes(pd.Series(values[selected].astype(dtype)))
+    return hashes
+
+def _minhash(sequences, n_hashes=128, seed=0):
+    """One-permutation MinHash signatures of the sequences, and their number of distinct items.
+
+    Items are hashed once (see `_item_hashes`, mixed with a seeded salt), and split by
+    their hash into `n_hashes` bins; the signature holds the minimum hash per bin (or the
+    maximum uint64 for empty bins). This costs a single hash per item (rather than one per
+    hash function), and `n_hashes` values per sequence.
+    """
+    salt = np.random.default_rng(seed).integers(0, 2**64, dtype=np.uint64)
+    signatures = np.full((len(sequences), n_hashes), np.iinfo(np.uint64).max, dtype=np.uint64)
+    sizes = np.zeros(len(sequences), dtype=np.int64)
+    for i, seq in enumerate(sequences):
+        hashes = _item_hashes(_as_series(seq))
+        hashes = pd.unique(_mix64(hashes ^ salt))
+        np.minimum.at(signatures[i], hashes % np.uint64(n_hashes), hashes // np.uint64(n_hashes))
+        sizes[i] = len(hashes)
+    return signatures, sizes
+
+def _intersections(sequences, engine='incidence', n_hashes=128, seed=0):
+    """The (n_sets x n_sets) intersection counts, and the (n_sets, ) sizes of the sequences.
+    For the `minhash` engine, intersections are estimated from the fraction of matching bins
+    (among the bins that are not empty in both signatures), i.e., the Jaccard index `J`,
+    as `J / (1 + J) * (size_a + size_b)`."""
+    if engine == 'minhash':
+        signatures, sizes = _minhash(sequences, n_hashes=n_hashes, seed=seed)
+        filled = signatures != np.iinfo(np.uint64).max
+        matches = np.zeros((len(sizes), len(sizes)), dtype=np.int64)
+        n_bins = np.zeros((len(sizes), len(sizes)), dtype=np.int64)
+        for k in range(n_hashes):
+            matches += (signatures[:, k, None] == signatures[None, :, k]) & filled[:, k, None]
+            n_bins += filled[:, k, None] | filled[None, :, k]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            jaccard = np.where(n_bins > 0, matches / n_bins, 0.0)
+        counts = jaccard / (1 + jaccard) * (sizes[:, None] + sizes[None, :])
+        return counts, sizes
+    incidence, _ = _incidence(sequences)
+    counts = (incidence @ incidence.T).toarray()
+    return counts, np.diag(counts).copy()
+
+def count_sets_overlap(sequences, names=None, exclusive=False, engine='incidence', n_hashes=128, seed=0):
     """Generate a NxN table of overlap counts, where `N=len(sequences)`.
 
     Args:
@@ -8,21 +122,38 @@ def count_sets_overlap(sequences, names=None, exclusive=False):
             items that need to be counted.
         names (_type_, optional): If provided, the corresponding element in the output
             count table will be named as such. Otherwise, sequences are indexed from `0` to
-            `N`. If a given sequence has a `name` attribute, then that name will be 
+            `N`. If a given sequence has a `name` attribute, then that name will be
             prioritized. Defaults to None.
-        exclusive (bool, optional): Whether exclusive overlaps should be counted. 
+        exclusive (bool, optional): Whether exclusive overlaps should be counted.
             Defaults to False.
+        engine (str, optional): `incidence` encodes all sequences as a sparse incidence matrix
+            over the union of their items, and gets all intersections from a single matrix
+            product. `minhash` estimates the overlaps from MinHash signatures, with a memory
+            footprint of `n_hashes` values per sequence (i.e., for very large sequences).
+            `python` compares the sequences pair by pair as Python sets.
+            Defaults to 'incidence'.
+        n_hashes (int, optional): Signature size of the `minhash` engine; the standard error of
+            the estimated Jaccard index `J` is about `sqrt(J * (1 - J) / n_hashes)`.
+            Defaults to 128.
+        seed (int, optional): Seed of the `minhash` hash functions. Defaults to 0.
 
     Returns:
-        Pandas.DataFrame: A dataframe of overlap counts, where columns and indices are
-            named according to the given sequences.
+        Pandas.DataFrame: A dataframe of (integer) overlap counts, where columns and indices are
+            named according to the given sequences. The `minhash` estimates are floats.
     """
+    assert engine in ('incidence', 'minhash', 'python'), f'Unknown engine: {engine}'
+    sequences = list(sequences)
+    names = _set_names(sequences, names)
+
+    if engine != 'python':
+        counts, sizes = _intersections(sequences, engine=engine, n_hashes=n_hashes, seed=seed)
+        if exclusive:
+            counts = sizes[:, None] - counts
+        return pd.DataFrame(counts, index=names, columns=names)
+
     n_seqs = len(sequences)
     sets = [set(seq) for seq in sequences]
-    if names is None:
-        names = [seq.name if hasattr(seq, 'name') else i for (i, seq) in enumerate(sequences)]
-
-    overlaps = pd.DataFrame(columns=names, index=names)
+    overlaps = pd.DataFrame(0, columns=names, index=names)
     for i in range(n_seqs):
         for j in range(n_seqs):
             if exclusive:
@@ -30,3 +161,207 @@ def count_sets_overlap(sequences, names=None, exclusive=False):
             else:
                 overlaps.iat[i, j] = len(sets[i] & sets[j])
     return overlaps
+
+def compare_sets(sequences, names=None, upper=False, engine='incidence', n_hashes=128, seed=0):
+    """Pairwise overlap statistics of the sequences, all derived (as vectors) from their
+    intersection counts (see `count_sets_overlap`) and sizes.
+
+    Args:
+        sequences (iterable, list): See `count_sets_overlap`.
+        names (list, optional): See `count_sets_overlap`.
+        upper (bool, optional): Only return each pair of different sequences once (i.e., the
+            upper triangle of the symmetric pairs). Defaults to False (i.e., all N**2 pairs).
+        engine (str, optional): `incidence` (exact) or `minhash` (approximate), see
+            `count_sets_overlap`. Defaults to 'incidence'.
+        n_hashes, seed: See `count_sets_overlap`.
+
+    Returns:
+        Pandas.DataFrame: One row per pair (`set_a`, `set_b`) with the `size_a`, `size_b`,
+            `intersection`, `exclusive_a` (items of `set_a` that are not in `set_b`),
+            `exclusive_b`, `union`, `jaccard`, `dice` and `overlap` (i.e., Szymkiewicz-Simpson,
+            the intersection over the smaller size) columns. Undefined indices (e.g., the
+            overlap with an empty set) are NaN.
+    """
+    assert engine in ('incidence', 'minhash'), f'Unknown engine: {engine}'
+    sequences = list(sequences)
+    names = _set_names(sequences, names)
+    counts, sizes = _intersections(sequences, engine=engine, n_hashes=n_hashes, seed=seed)
+    if upper:
+        rows, cols = np.triu_indices(len(sizes), k=1)
+    else:
+        rows, cols = np.indices(counts.shape).reshape(2, -1)
+    inter = counts[rows, cols]
+    size_a = sizes[rows]
+    size_b = sizes[cols]
+    union = size_a + size_b - inter
+    labels = np.empty(len(names), dtype=object)
+    labels[:] = list(names)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'set_a': labels[rows],
+            'set_b': labels[cols],
+            'size_a': size_a,
+            'size_b': size_b,
+            'intersection': inter,
+            'exclusive_a': size_a - inter,
+            'exclusive_b': size_b - inter,
+            'union': union,
+            'jaccard': inter / union,
+            'dice': 2 * inter / (size_a + size_b),
+            'overlap': inter / np.minimum(size_a, size_b),
+        })
+
+def _membership_masks(incidence):
+    """Packs the memberships of each item (i.e., the columns of an incidence matrix) into a bit
+    pattern, one (n_items x ceil(n_sets / 64)) row of uint64 words per item."""
+    n_sets, n_items = incidence.shape
+    masks = np.zeros((n_items, max(1, -(-n_sets // 64))), dtype=np.uint64)
+    for i in range(n_sets):
+        items = incidence.indices[incidence.indptr[i]:incidence.indptr[i + 1]]
+        masks[items, i // 64] |= np.uint64(1) << np.uint64(i % 64)
+    return masks
+
+def _count_patterns(masks, n_sets):
+    """The distinct membership patterns (as an (n_patterns x n_sets) boolean matrix) of the
+    items, and the number of items that share each pattern."""
+    if masks.shape[1] == 1:
+        patterns, counts = np.unique(masks[:, 0], return_counts=True)
+        patterns = patterns[:, None]
+    else:  # much faster than `np.unique(axis=0)`
+        masks = masks[np.lexsort(masks.T[::-1])]
+        starts = np.flatnonzero(np.concatenate([[True], (masks[1:] != masks[:-1]).any(axis=1)]))
+        patterns = masks[starts]
+        counts = np.diff(np.append(starts, len(masks)))
+    set_ids = np.arange(n_sets)
+    words = patterns[:, set_ids // 64]
+    bits = (words >> (set_ids % 64).astype(np.uint64)) & np.uint64(1)
+    return bits.astype(bool), counts
+
+def count_membership_patterns(sequences, names=None, min_size=1):
+    """Counts the items of every distinct membership pattern across the sequences (i.e., the
+    exclusive intersections shown by an UpSet plot).
+
+    The memberships of each item are packed into a bit pattern in a single vectorized pass per
+    sequence, and the patterns are then counted at once.
+
+    Args:
+        sequences (iterable, list): See `count_sets_overlap`.
+        names (list, optional): See `count_sets_overlap`.
+        min_size (int, optional): Only report the patterns that are shared by at least this
+            many items. Defaults to 1.
+
+    Returns:
+        Pandas.Series: The number of items per pattern, sorted from the largest to the smallest,
+            and indexed by a boolean MultiIndex (one level per sequence, True for membership),
+            as expected by e.g., `upsetplot.UpSet`.
+    """
+    sequences = list(sequences)
+    names = _set_names(sequences, names)
+    incidence, _ = _incidence(sequences)
+    patterns, counts = _count_patterns(_membership_masks(incidence), len(sequences))
+    keep = counts >= min_size
+    patterns, counts = patterns[keep], counts[keep]
+    order = np.argsort(-counts, kind='stable')
+    index = pd.MultiIndex.from_arrays(list(patterns[order].T), names=list(names))
+    return pd.Series(counts[order], index=index, name='count')
+
+class _MembershipStream:
+    """Incrementally codes the set names and items of (set, item) records as integers, and
+    packs the memberships of each item into uint64 bit patterns (see `_membership_masks`)."""
+
+    def __init__(self):
+        self.set_codes = {}
+        self.item_codes = {}
+        self.masks = np.zeros((1024, 1), dtype=np.uint64)
+
+    @staticmethod
+    def _encode(values, codes):
+        inverse, uniques = pd.factorize(values)
+        new_codes = np.fromiter(
+            (codes.setdefault(value, len(codes)) for value in uniques),
+            dtype=np.int64, count=len(uniques),
+        )
+        return new_codes[inverse]
+
+    def update(self, set_names, items):
+        set_names = pd.Series(set_names, dtype=object if len(set_names) == 0 else None)
+        items = pd.Series(items, dtype=object if len(items) == 0 else None)
+        observed = (set_names.notna() & items.notna()).to_numpy()
+        set_ids = self._encode(set_names[observed], self.set_codes)
+        item_ids = self._encode(items[observed], self.item_codes)
+
+        n_rows, n_words = self.masks.shape
+        if len(self.item_codes) > n_rows or len(self.set_codes) > 64 * n_words:
+            masks = np.zeros(
+                (max(n_rows, 2 * len(self.item_codes)), max(n_words, -(-len(self.set_codes) // 64))),
+                dtype=np.uint64,
+            )
+            masks[:n_rows, :n_words] = self.masks
+            self.masks = masks
+        bits = np.uint64(1) << (set_ids % 64).astype(np.uint64)
+        np.bitwise_or.at(self.masks, (item_ids, set_ids // 64), bits)
+        return self
+
+    def intersections(self):
+        """The (n_sets x n_sets) intersection counts, from the counts of the distinct patterns."""
+        n_sets = len(self.set_codes)
+        patterns, counts = _count_patterns(self.masks[:len(self.item_codes)], n_sets)
+        patterns = patterns.astype(np.int64)
+        return (patterns.T * counts) @ patterns
+
+def _iter_record_chunks(records, columns=None, chunk_size=100_000):
+    """Yields `(set_names, items)` arrays from (set, item) tuples, or from dataframe chunks
+    (e.g., `pd.read_csv(..., chunksize=...)`) or arrow record batches (e.g.,
+    `pyarrow.parquet.ParquetFile(...).iter_batches()`)."""
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return
+    records = chain([first], records)
+    if isinstance(first, pd.DataFrame) or hasattr(first, 'to_pandas'):
+        for chunk in records:
+            if not isinstance(chunk, pd.DataFrame):
+                chunk = chunk.to_pandas()
+            set_column, item_column = columns if columns is not None else chunk.columns[:2]
+            yield chunk[set_column].to_numpy(), chunk[item_column].to_numpy()
+        return
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        set_names, items = zip(*chunk)
+        yield list(set_names), list(items)
+
+def count_sets_overlap_stream(records, exclusive=False, columns=None, chunk_size=100_000):
+    """Same overlap table as `count_sets_overlap`, but from a stream of (set, item) records,
+    e.g., a generator or a chunked reader of a large file, that is consumed chunk by chunk.
+
+    Set names and items are coded as integers incrementally, and only one bit pattern of the
+    memberships per distinct item is kept, i.e., the memory is bounded by the number of distinct
+    items (and the size of a chunk), rather than the number of records.
+
+    Example:
+        count_sets_overlap_stream(pd.read_csv('memberships.csv', chunksize=10**6))
+        count_sets_overlap_stream(pq.ParquetFile('memberships.parquet').iter_batches())
+        count_sets_overlap_stream((row.pathway, row.gene) for row in rows)
+
+    Args:
+        records (iterable): (set, item) tuples, or chunks of records as `pd.DataFrame`s or
+            arrow record batches. Records with a missing set or item are skipped.
+        exclusive (bool, optional): See `count_sets_overlap`. Defaults to False.
+        columns (tuple, optional): The (set, item) columns of the chunks. Defaults to None
+            (i.e., the first two columns).
+        chunk_size (int, optional): Number of tuples that are coded at once. Defaults to 100_000.
+
+    Returns:
+        Pandas.DataFrame: A dataframe of (integer) overlap counts, where columns and indices are
+            the set names, in the order of their first appearance.
+    """
+    stream = _MembershipStream()
+    for set_names, items in _iter_record_chunks(records, columns=columns, chunk_size=chunk_size):
+        stream.update(set_names, items)
+    counts = stream.intersections()
+    if exclusive:
+        counts = np.diag(counts)[:, None] - counts
+    names = list(stream.set_codes)
+    return pd.DataFrame(counts, index=names, columns=names)
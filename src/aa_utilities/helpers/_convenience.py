@@ -246,6 +246,46 @@ def store(data: Any, namespace: dict, name: str='stored_data', copy=True) -> Any
         namespace[name] = data
     return data
 
+def _sort_keys(columns, orders, ascending=True, na_position='last'):
+    """Integer sort keys of the given columns, one per column: the position of each value in
+    its `orders` (reversed if not `ascending`), and the undefined values at the `na_position`.
+    Also returns the (boolean) masks of the undefined values, per column.
+    """
+    if isinstance(ascending, (bool, np.bool_)):
+        ascending = [ascending] * len(columns)
+    assert len(ascending) == len(columns), '`ascending` must be a bool or a list of bools (per column)'
+
+    keys = []
+    masks = []
+    for values, categories, is_ascending in zip(columns, orders, ascending):
+        categories = pd.Index(list(dict.fromkeys(categories)))  # unique, preserves order
+        codes = categories.get_indexer(values).astype(np.int64)
+        n_categories = len(categories)
+        undefined = codes < 0
+        if not is_ascending:
+            codes = n_categories - 1 - codes
+        codes[undefined] = n_categories if na_position == 'last' else -1
+        keys.append(codes)
+        masks.append(undefined)
+    return keys, masks
+
+def _top_n_indexer(keys, n):
+    """Positions of the first `n` rows of the stable lexicographic order of `keys`, without
+    sorting all rows: the keys are combined into a single (mixed radix) integer, the `n`
+    smallest are selected via a partition, and only those are sorted."""
+    n_rows = len(keys[0])
+    radices = [int(key.max(initial=0)) - int(key.min(initial=0)) + 1 for key in keys]
+    if n >= n_rows or np.prod(radices, dtype=float) >= 2**62:  # combined key would overflow
+        return np.lexsort(keys[::-1])[:n]
+    combined = np.zeros(n_rows, dtype=np.int64)
+    for key, radix in zip(keys, radices):
+        combined = combined * radix + (key - key.min())
+    kth = np.partition(combined, n - 1)[n - 1]
+    selected = np.flatnonzero(combined < kth)
+    ties = np.flatnonzero(combined == kth)[:n - len(selected)]  # the first ties, for stability
+    selected = np.concatenate([selected, ties])
+    return selected[np.argsort(combined[selected], kind='stable')]
+
 def sort_by(
         data: Union[pd.Series, pd.DataFrame],
         orders: Union[list, dict, pd.Series, pd.DataFrame],
@@ -253,7 +293,10 @@ def sort_by(
         method='mergesort',
         na_position: Literal['first', 'last'] = 'last',
         validate=True,
-    ) -> Union[pd.DataFrame, pd.Series]:
+        engine: Literal['codes', 'pandas'] = 'codes',
+        return_indexer=False,
+        n=None,
+    ) -> Union[pd.DataFrame, pd.Series, np.ndarray]:
     """\
     Sorts the given data according to provided orders. Any undefined value will be assumed
     as NaN and placed at the `na_position`. The undefined orders are preserved.
@@ -264,9 +307,19 @@ def sort_by(
         in `orders` will be used for sorting.
         ascending (bool, optional): Order of the sort. Defaults to True.
         na_position: Where to place undefined enties, can be 'first', or 'last'.
+        engine: `codes` computes the ordering from the key columns only (their integer codes
+            in `orders`, via a stable `np.lexsort`) and takes the rows once. `pandas` sorts a
+            copy of `data` with categorical columns (`method` is only used by this engine).
+            Defaults to 'codes'.
+        return_indexer (bool, optional): Return the positional permutation (i.e., for
+            `data.iloc[...]`) instead of the sorted data. Only for the `codes` engine.
+            Defaults to False.
+        n (int, optional): Only return the first `n` rows of the order (as `.head(n)`), which
+            are selected via a partition of the keys, so that only these rows are sorted.
+            Only for the `codes` engine. Defaults to None (i.e., all rows).
 
     Returns:
-        Union[pd.Series, pd.DataFrame]: Sorted data
+        Union[pd.Series, pd.DataFrame]: Sorted data (or the permutation, see `return_indexer`)
     
     Notes: 
         * If sorting a `pd.Series`, then `orders` can be any `Iterable`. Note that in 
@@ -298,6 +351,9 @@ def sort_by(
 
     # sanity checks
     assert isinstance(data, (pd.DataFrame, pd.Series)), '`data` must be either a `pd.DataFrame` or `pd.Series` instance'
+    assert engine in ('codes', 'pandas'), f'Unknown engine: {engine}'
+    assert engine == 'codes' or not return_indexer, '`return_indexer` is only available for the `codes` engine'
+    assert engine == 'codes' or n is None, '`n` is only available for the `codes` engine'
 
     # prepare orders
     if isinstance(orders, (pd.Series, )):
@@ -308,6 +364,30 @@ def sort_by(
             col_orders[col_name] = list(orders[col_name].unique())
         orders = col_orders
     
+    if engine == 'codes':
+        if isinstance(data, (pd.Series, )):
+            # keep unique values only, preserves order
+            columns, orders = [data], [list(dict.fromkeys(orders).keys())]
+        else:
+            assert isinstance(orders, (dict, )), 'For a `pd.DataFrame`, `orders` must be defined per column'
+            columns, orders = [data[col] for col in orders.keys()], list(orders.values())
+        keys, undefined = _sort_keys(columns, orders, ascending=ascending, na_position=na_position)
+        if validate:
+            for col, mask in zip(columns, undefined):
+                if mask.all():
+                    raise ValueError(f'Every value in "{col.name}" is undefined! Have you defined the orders properly?')
+        if not keys:
+            indexer = np.arange(len(data))[:n]
+        elif n is not None and n <= 0:
+            indexer = np.arange(0)
+        elif n is not None:
+            indexer = _top_n_indexer(keys, n)
+        else:
+            indexer = np.lexsort(keys[::-1])
+        if return_indexer:
+            return indexer
+        return data.take(indexer)
+
     # if data is `pd.Series`, only orders.keys() are used
     if isinstance(data, (pd.Series, )):
         # keep unique values only, preserves order
@@ -0,0 +1,371 @@
+# tests/computation/test_corr.py
+
+import subprocess
+import sys
+
+import pytest
+import numpy as np
+from scipy import stats
+
+from aa_utilities._configurations import configs
+from aa_utilities.computation._corr import (
+    bicor,
+    correlate_sharded,
+    correlation_test,
+    kendall,
+    pearson,
+    permutation_test,
+    precompile,
+    rank,
+    spearman,
+    top_k,
+    _pearson_numba,
+    _shard_initializer,
+)
+
+# ----- Initializations -----
+
+@pytest.fixture
+def mats():
+    rng = np.random.default_rng(seed=42)
+    return rng.normal(size=(20, 50)), rng.normal(size=(15, 50))
+
+# ----- Pearson -----
+
+@pytest.mark.parametrize("low_memory", [False, True])
+def test_pearson_matches_corrcoef(mats, low_memory):
+    A, B = mats
+    expected = np.corrcoef(A, B)[:len(A), len(A):]
+    assert np.allclose(pearson(A, B, low_memory=low_memory), expected)
+    assert np.allclose(_pearson_numba(A, B, low_memory=low_memory), expected)
+    assert np.allclose(pearson(A, low_memory=low_memory), np.corrcoef(A))
+
+def test_n_threads_from_configs(mats, monkeypatch):
+    A, B = mats
+    monkeypatch.setattr(configs.numba, "n_threads", 1)
+    assert np.allclose(pearson(A, B), pearson(A, B, n_threads=2))
+
+def test_import_does_not_load_numba():
+    code = "import sys; import aa_utilities.computation._corr; assert 'numba' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+def test_precompile_covers_every_kernel():
+    code = (
+        "from aa_utilities.computation import _corr; _corr.precompile(); "
+        "missing = [k.__name__ for k in _corr._LazyJit.kernels if k.dispatcher is None or not k.dispatcher.signatures]; "
+        "assert not missing, missing"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+def test_precompile(mats):
+    precompile(dtypes=[np.float32])
+    A, B = mats
+    assert np.allclose(spearman(A.astype(np.float32), B.astype(np.float32)), spearman(A, B), atol=1e-5)
+
+# ----- Ranking -----
+
+@pytest.mark.parametrize("method", ["average", "ordinal"])
+def test_rank_matches_rankdata(method):
+    rng = np.random.default_rng(seed=0)
+    mat = rng.integers(0, 5, size=(10, 30)).astype(float)
+    assert np.array_equal(rank(mat, method=method), stats.rankdata(mat, method=method, axis=1))
+
+def test_rank_keeps_nans():
+    mat = np.array([[3.0, np.nan, 5.0, 3.0]])
+    assert np.array_equal(rank(mat), [[1.5, np.nan, 3.0, 1.5]], equal_nan=True)
+    assert np.array_equal(rank(mat, method="ordinal"), [[1, 4, 3, 2]])
+
+# ----- Spearman -----
+
+@pytest.mark.parametrize("low_memory", [False, True])
+def test_spearman_matches_scipy(mats, low_memory):
+    A, B = mats
+    expected = stats.spearmanr(A, B, axis=1).statistic[:len(A), len(A):]
+    assert np.allclose(spearman(A, B, low_memory=low_memory), expected)
+    assert np.allclose(spearman(A), stats.spearmanr(A, axis=1).statistic)
+
+def test_spearman_with_ties():
+    rng = np.random.default_rng(seed=1)
+    A = rng.integers(0, 4, size=(8, 40))
+    assert np.allclose(spearman(A), stats.spearmanr(A, axis=1).statistic)
+
+# ----- Tiled -----
+
+@pytest.mark.parametrize("func", [pearson, spearman])
+def test_tiled_matches_full(mats, func):
+    A, B = mats
+    assert np.allclose(func(A, B, block_size=7), func(A, B))
+    assert np.allclose(func(A, max_memory=8 * 2000), func(A))
+
+def test_tiled_writes_npy(mats, tmp_path):
+    A, B = mats
+    path = tmp_path / "corr.npy"
+    out = spearman(A, B, out=path, block_size=4)
+    assert isinstance(out, np.memmap)
+    assert np.allclose(np.load(path), spearman(A, B))
+
+# ----- Symmetric -----
+
+@pytest.mark.parametrize("block_size", [None, 3, 64])
+def test_condensed_matches_squareform(mats, block_size):
+    from scipy.spatial.distance import squareform
+
+    A, _ = mats
+    full = spearman(A)
+    condensed = spearman(A, condensed=True, block_size=block_size)
+    assert condensed.shape == (len(A) * (len(A) - 1) // 2, )
+    assert np.allclose(squareform(condensed, checks=False), full - np.diag(np.diag(full)))
+
+def test_symmetric_tiles_are_mirrored(mats):
+    A, _ = mats
+    assert np.allclose(pearson(A, block_size=6), np.corrcoef(A))
+    assert np.allclose(pearson(A, low_memory=True), np.corrcoef(A))
+
+def test_condensed_requires_self_correlation(mats):
+    A, B = mats
+    with pytest.raises(AssertionError):
+        pearson(A, B, condensed=True)
+
+# ----- Missing values -----
+
+@pytest.mark.parametrize("low_memory", [False, True])
+def test_pairwise_complete_pearson(low_memory):
+    import pandas as pd
+
+    rng = np.random.default_rng(seed=3)
+    A = rng.normal(size=(12, 40))
+    A[rng.random(A.shape) < 0.2] = np.nan
+    corr, n_obs = pearson(A, nan_policy="omit", low_memory=low_memory, block_size=5)
+    mask = (~np.isnan(A)).astype(int)
+    assert np.allclose(corr, pd.DataFrame(A.T).corr().to_numpy())
+    assert np.array_equal(n_obs, mask @ mask.T)
+
+def test_pairwise_complete_spearman():
+    import pandas as pd
+
+    rng = np.random.default_rng(seed=9)
+    A = np.round(rng.normal(size=(10, 40)), 1)
+    A[rng.random(A.shape) < 0.3] = np.nan
+    A[0] = rng.normal(size=40)  # a complete row
+    B = rng.normal(size=(4, 40))
+    corr, n_obs = spearman(A, nan_policy="omit")
+    assert np.allclose(corr, pd.DataFrame(A.T).corr(method="spearman").to_numpy())
+    corr, _ = spearman(A, B, nan_policy="omit", block_size=3)
+    expected = pd.DataFrame(np.vstack([A, B]).T).corr(method="spearman").to_numpy()[:10, 10:]
+    assert np.allclose(corr, expected)
+
+@pytest.mark.parametrize("func", [pearson, spearman])
+@pytest.mark.parametrize("kwargs", [{"condensed": True}, {"max_memory": 10**6}, {"out": np.empty((6, 6))}])
+def test_pairwise_complete_rejects_tiled_arguments(func, kwargs):
+    A = np.random.default_rng(seed=10).normal(size=(6, 20))
+    with pytest.raises(AssertionError):
+        func(A, nan_policy="omit", **kwargs)
+
+def test_pairwise_complete_spearman_shared_missingness():
+    rng = np.random.default_rng(seed=4)
+    A = rng.normal(size=(6, 30))
+    A[:, :5] = np.nan
+    corr, n_obs = spearman(A, nan_policy="omit")
+    assert np.allclose(corr, stats.spearmanr(A[:, 5:], axis=1).statistic)
+    assert (n_obs == 25).all()
+
+# ----- Top-k -----
+
+@pytest.mark.parametrize("absolute", [True, False])
+def test_top_k_matches_full_matrix(mats, absolute):
+    A, B = mats
+    full = spearman(A, B)
+    indices, values = top_k(A, B, k=4, absolute=absolute, block_size=6)
+    score = np.abs(full) if absolute else full
+    expected = np.argsort(-score, axis=1)[:, :4]
+    assert np.array_equal(indices, expected)
+    assert np.allclose(values, np.take_along_axis(full, expected, axis=1))
+
+def test_top_k_larger_than_block_size(mats):
+    A, B = mats
+    full = spearman(A, B)
+    indices, values = top_k(A, B, k=10, block_size=4)
+    expected = np.argsort(-np.abs(full), axis=1)[:, :10]
+    assert np.array_equal(indices, expected)
+    assert np.allclose(values, np.take_along_axis(full, expected, axis=1))
+    indices, _ = top_k(A, k=10, block_size=3)
+    assert (indices != np.arange(len(A))[:, None]).all()
+
+def test_top_k_excludes_self(mats):
+    A, _ = mats
+    indices, values = top_k(A, k=3, method="pearson", block_size=7)
+    full = np.corrcoef(A)
+    np.fill_diagonal(full, 0)
+    assert np.array_equal(indices, np.argsort(-np.abs(full), axis=1)[:, :3])
+    assert (indices != np.arange(len(A))[:, None]).all()
+
+# ----- Dtypes -----
+
+@pytest.mark.parametrize("func", [pearson, spearman])
+def test_float32_is_preserved(mats, func):
+    A, B = mats
+    A32, B32 = A.astype(np.float32), B.astype(np.float32)
+    for result in (func(A32, B32), func(A32, B32, low_memory=True), func(A32, block_size=5), func(A, B, dtype=np.float32)):
+        assert result.dtype == np.float32
+    assert np.allclose(func(A32, B32), func(A, B), atol=1e-5)
+    assert func(A.astype(int), B.astype(int)).dtype == np.float64
+
+# ----- Permutations -----
+
+def test_permutation_test_matches_scipy():
+    rng = np.random.default_rng(seed=5)
+    A = rng.normal(size=(3, 12))
+    B = A + rng.normal(scale=2, size=(3, 12))
+    corr, pvalues = permutation_test(A, B, method="pearson", n_permutations=2000, seed=0, batch_size=300)
+    assert np.allclose(corr, np.corrcoef(A, B)[:3, 3:])
+    for i in range(3):
+        res = stats.permutation_test(
+            (A[i], B[i]), lambda x, y: stats.pearsonr(x, y).statistic,
+            permutation_type="pairings", n_resamples=2000, random_state=0,
+        )
+        assert pvalues[i, i] == pytest.approx(res.pvalue, abs=0.05)
+
+def test_permutation_test_is_reproducible(mats):
+    A, B = mats
+    _, p1 = permutation_test(A, B, n_permutations=50, seed=1, batch_size=7, n_threads=2)
+    _, p2 = permutation_test(A, B, n_permutations=50, seed=1, batch_size=7)
+    assert np.array_equal(p1, p2)
+    assert ((p1 > 0) & (p1 <= 1)).all()
+
+def test_permutation_test_undefined_correlation(mats):
+    A, B = mats
+    A = A.copy()
+    A[0] = 0.0
+    corr, pvalues = permutation_test(A, B, method="pearson", n_permutations=99, seed=0)
+    assert np.isnan(corr[0]).all() and np.isnan(pvalues[0]).all()
+    assert np.isfinite(pvalues[1:]).all()
+
+# ----- Analytic p-values -----
+
+@pytest.mark.parametrize("method", ["pearson", "spearman"])
+def test_correlation_test_matches_scipy(mats, method):
+    A, B = mats
+    corr, pvalues, qvalues = correlation_test(A, B, method=method)
+    func = stats.pearsonr if method == "pearson" else stats.spearmanr
+    for i, j in [(0, 0), (3, 7), (19, 14)]:
+        expected = func(A[i], B[j])
+        assert corr[i, j] == pytest.approx(expected.statistic)
+        assert pvalues[i, j] == pytest.approx(expected.pvalue)
+    assert np.allclose(qvalues.ravel(), stats.false_discovery_control(pvalues.ravel()))
+
+def test_correlation_test_sparse_matches_dense():
+    rng = np.random.default_rng(seed=6)
+    A = rng.normal(size=(30, 25))
+    A[10:20] += A[:10]
+    corr, pvalues, qvalues = correlation_test(A, method="pearson")
+    upper = np.triu(np.ones_like(corr, dtype=bool), k=1)
+    expected = upper & (qvalues <= 0.05)
+    s_corr, s_pvalues, s_qvalues = correlation_test(A, method="pearson", alpha=0.05, block_size=7)
+    assert expected.sum() > 0
+    assert np.array_equal(s_qvalues.toarray() > 0, expected)
+    assert np.allclose(s_corr.toarray()[expected], corr[expected])
+    assert np.allclose(s_qvalues.toarray()[expected], qvalues[expected])
+    assert np.allclose(s_pvalues.toarray()[expected], pvalues[expected])
+
+# ----- Sparse inputs -----
+
+def test_sparse_inputs_are_not_densified():
+    from scipy import sparse
+
+    A = sparse.random_array((20, 60), density=0.2, format="csr", rng=7, data_sampler=lambda size: np.random.default_rng(7).normal(size=size))
+    B = sparse.random_array((10, 60), density=0.3, format="csc", rng=8)
+    dense_a, dense_b = A.toarray(), B.toarray()
+    assert np.allclose(pearson(A, B), pearson(dense_a, dense_b))
+    assert np.allclose(pearson(A), np.corrcoef(dense_a))
+    assert np.allclose(spearman(A, B), spearman(dense_a, dense_b))
+    assert np.allclose(spearman(A, dense_b), spearman(dense_a, dense_b))
+    assert np.allclose(spearman(A), stats.spearmanr(dense_a, axis=1).statistic)
+
+# ----- Kendall -----
+
+@pytest.mark.parametrize("ties", [False, True])
+def test_kendall_matches_scipy(mats, ties):
+    A, B = mats
+    if ties:
+        A, B = np.round(A), np.round(B)
+    tau = kendall(A, B)
+    for i, j in [(0, 0), (5, 9), (19, 14)]:
+        assert tau[i, j] == pytest.approx(stats.kendalltau(A[i], B[j]).statistic)
+    sym = kendall(A)
+    assert np.allclose(sym, sym.T)
+    assert sym[2, 7] == pytest.approx(stats.kendalltau(A[2], A[7]).statistic)
+
+def test_kendall_propagates_nans(mats):
+    A, B = mats
+    A = A.copy()
+    A[3, 5] = np.nan
+    tau = kendall(A, B)
+    assert np.isnan(stats.kendalltau(A[3], B[0]).statistic)
+    assert np.isnan(tau[3]).all()
+    assert np.isfinite(np.delete(tau, 3, axis=0)).all()
+    sym = kendall(A)
+    assert np.isnan(sym[3]).all() and np.isnan(sym[:, 3]).all()
+
+# ----- Bicor -----
+
+def _biweight(v):
+    dev = v - np.median(v)
+    u = dev / (9 * np.median(np.abs(dev)))
+    return dev * (1 - u**2)**2 * (np.abs(u) < 1)
+
+def _bicor_reference(x, y):
+    x, y = _biweight(x), _biweight(y)
+    return x @ y / np.sqrt((x @ x) * (y @ y))
+
+def test_bicor_matches_reference(mats):
+    A, B = mats
+    A = A.copy()
+    A[0, 0] = 50.0  # an outlier that drives Pearson's correlation
+    expected = np.array([[_bicor_reference(a, b) for b in B] for a in A])
+    assert np.allclose(bicor(A, B), expected)
+    assert np.allclose(bicor(A, B, block_size=6), expected)
+    assert np.allclose(bicor(A, low_memory=True), [[_bicor_reference(a, b) for b in A] for a in A])
+    corr, _, _ = correlation_test(A, B, method="bicor")
+    assert np.allclose(corr, expected)
+
+def test_bicor_zero_mad_falls_back_to_pearson(mats):
+    A, B = mats
+    A = A.copy()
+    A[0, :30] = 1.0  # more than half of the values are tied, i.e., MAD is zero
+    x = A[0] - A[0].mean()
+    expected = [x @ _biweight(b) / np.sqrt((x @ x) * (_biweight(b) @ _biweight(b))) for b in B]
+    assert np.allclose(bicor(A, B)[0], expected)
+
+# ----- Sharded -----
+
+def test_sharded_matches_in_process(mats, tmp_path):
+    A, B = mats
+    assert np.allclose(correlate_sharded(A, B, n_workers=2, block_size=6), spearman(A, B))
+    assert np.allclose(correlate_sharded(A, method="pearson", n_workers=2, block_size=7), np.corrcoef(A))
+    out = correlate_sharded(A, B, n_workers=2, out=tmp_path / "corr.npy")
+    assert np.allclose(np.load(tmp_path / "corr.npy"), spearman(A, B))
+    assert isinstance(out, np.memmap)
+
+def test_correlation_test_with_constant_row(mats):
+    A, B = mats
+    A = A.copy()
+    A[0] = 1.0
+    _, pvalues, qvalues = correlation_test(A, B, method="pearson")
+    assert np.isnan(pvalues[0]).all() and np.isnan(qvalues[0]).all()
+    finite = np.isfinite(pvalues)
+    assert finite[1:].all()
+    assert np.allclose(qvalues[finite], stats.false_discovery_control(pvalues[finite]))
+    _, pvalues, qvalues = correlation_test(A, method="pearson")
+    assert np.array_equal(np.isnan(qvalues), np.isnan(pvalues))
+    upper = np.triu_indices(len(A), k=1)
+    finite = np.isfinite(pvalues[upper])
+    assert np.allclose(qvalues[upper][finite], stats.false_discovery_control(pvalues[upper][finite]))
+    _, _, s_qvalues = correlation_test(A, method="pearson", alpha=1.0, block_size=6)
+    expected = np.where(np.isnan(qvalues), 0, np.triu(qvalues, k=1))
+    assert np.allclose(s_qvalues.toarray(), expected)
+
+def test_shard_workers_limit_blas_threads():
+    threadpoolctl = pytest.importorskip("threadpoolctl")
+    with threadpoolctl.threadpool_limits(limits=None):  # restores the current limits on exit
+        _shard_initializer({}, n_threads=1)
+        assert all(info["num_threads"] == 1 for info in threadpoolctl.threadpool_info())
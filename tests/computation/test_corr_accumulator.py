@@ -0,0 +1,44 @@
+# tests/computation/test_corr_accumulator.py
+
+import pytest
+import numpy as np
+
+from aa_utilities.computation._corr_accumulator import CorrelationAccumulator
+
+# ----- Initializations -----
+
+@pytest.fixture
+def batches():
+    rng = np.random.default_rng(seed=42)
+    # large offsets make naive (sum of squares) updates lose precision
+    return [1e6 + rng.normal(size=(8, size)) for size in (5, 17, 1, 30)]
+
+# ----- Streaming -----
+
+def test_update_matches_full_matrix(batches):
+    acc = CorrelationAccumulator()
+    for batch in batches:
+        acc.update(batch)
+    assert acc.count == 53
+    assert np.allclose(acc.pearson(), np.corrcoef(np.hstack(batches)))
+
+def test_cross_correlation(batches):
+    acc = CorrelationAccumulator()
+    for batch in batches:
+        acc.update(batch[:5], batch[5:])
+    full = np.hstack(batches)
+    assert np.allclose(acc.pearson(), np.corrcoef(full)[:5, 5:])
+
+# ----- Merging -----
+
+def test_merge_matches_single_accumulator(batches):
+    left = CorrelationAccumulator().update(batches[0]).update(batches[1])
+    right = CorrelationAccumulator().update(batches[2]).update(batches[3])
+    merged = left.merge(right).merge(CorrelationAccumulator())
+    assert np.allclose(merged.pearson(), np.corrcoef(np.hstack(batches)))
+
+def test_merge_rejects_mixed_modes(batches):
+    sym = CorrelationAccumulator().update(batches[0])
+    cross = CorrelationAccumulator().update(batches[1][:4], batches[1][4:])
+    with pytest.raises(AssertionError):
+        sym.merge(cross)
@@ -0,0 +1,159 @@
+# tests/computation/test_sets.py
+
+from collections import Counter
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from aa_utilities.computation.sets import (
+    compare_sets,
+    count_membership_patterns,
+    count_sets_overlap,
+    count_sets_overlap_stream,
+)
+
+# ----- Initializations -----
+
+@pytest.fixture
+def sequences():
+    rng = np.random.default_rng(seed=42)
+    seqs = [list(rng.choice(60, size=size)) for size in [5, 30, 45, 0, 12]]
+    seqs[1] += ['a', 'b']
+    seqs[2] = pd.Series(seqs[2] + ['b'], name='named')
+    seqs[4] = set(seqs[4])
+    return seqs
+
+# ----- Overlaps -----
+
+@pytest.mark.parametrize("exclusive", [False, True])
+def test_incidence_matches_python(sequences, exclusive):
+    expected = count_sets_overlap(sequences, exclusive=exclusive, engine="python")
+    overlaps = count_sets_overlap(sequences, exclusive=exclusive)
+    assert overlaps.equals(expected)
+    assert list(overlaps.index) == [0, 1, "named", 3, 4]
+    assert (overlaps.dtypes == np.int64).all()
+
+def test_overlap_counts(sequences):
+    overlaps = count_sets_overlap(sequences, names=list("ABCDE"))
+    sets = [set(seq) for seq in sequences]
+    assert overlaps.loc["B", "C"] == len(sets[1] & sets[2])
+    assert np.array_equal(np.diag(overlaps), [len(s) for s in sets])
+
+# ----- Similarities -----
+
+def test_compare_sets(sequences):
+    sets = [set(seq) for seq in sequences]
+    stats = compare_sets(sequences, names=list("ABCDE")).set_index(["set_a", "set_b"])
+    assert len(stats) == 25
+    a, b = sets[1], sets[2]
+    row = stats.loc[("B", "C")]
+    assert row["intersection"] == len(a & b)
+    assert row["exclusive_a"] == len(a - b) and row["exclusive_b"] == len(b - a)
+    assert row["jaccard"] == pytest.approx(len(a & b) / len(a | b))
+    assert row["dice"] == pytest.approx(2 * len(a & b) / (len(a) + len(b)))
+    assert row["overlap"] == pytest.approx(len(a & b) / min(len(a), len(b)))
+    assert np.isnan(stats.loc[("A", "D"), "overlap"])
+    exclusive = count_sets_overlap(sequences, names=list("ABCDE"), exclusive=True)
+    assert np.array_equal(stats["exclusive_a"].unstack().loc[list("ABCDE"), list("ABCDE")], exclusive)
+
+def test_compare_sets_upper(sequences):
+    stats = compare_sets(sequences)
+    upper = compare_sets(sequences, upper=True)
+    assert len(upper) == 10
+    order = {name: i for (i, name) in enumerate([0, 1, "named", 3, 4])}
+    assert (upper["set_a"].map(order) < upper["set_b"].map(order)).all()
+    merged = upper.merge(stats, on=["set_a", "set_b"], suffixes=("", "_all"))
+    assert np.allclose(merged["jaccard"], merged["jaccard_all"], equal_nan=True)
+
+# ----- Membership patterns -----
+
+@pytest.mark.parametrize("n_sets", [5, 70])  # one or several 64-bit words per pattern
+def test_membership_patterns(n_sets):
+    rng = np.random.default_rng(seed=42)
+    sequences = [rng.choice(100, size=rng.integers(0, 60), replace=False) for _ in range(n_sets)]
+    sets = [set(seq) for seq in sequences]
+    expected = Counter(tuple(item in s for s in sets) for item in set().union(*sets))
+    counts = count_membership_patterns(sequences)
+    assert len(counts) == len(expected)
+    assert all(counts.loc[pattern] == count for (pattern, count) in expected.items())
+    assert (np.diff(counts.to_numpy()) <= 0).all()
+    assert list(counts.index.names) == list(range(n_sets))
+
+def test_membership_patterns_min_size(sequences):
+    counts = count_membership_patterns(sequences, names=list("ABCDE"), min_size=2)
+    assert (counts >= 2).all()
+    everything = count_membership_patterns(sequences, names=list("ABCDE"))
+    assert counts.equals(everything[everything >= 2])
+    assert everything.sum() == len(set().union(*[set(seq) for seq in sequences]))
+
+# ----- MinHash -----
+
+def test_minhash_estimates():
+    items = np.arange(40_000)
+    sequences = [items[:20_000], items[10_000:30_000], items[15_000:], pd.Series(["a", "b"])]
+    exact = compare_sets(sequences, upper=True)
+    estimated = compare_sets(sequences, upper=True, engine="minhash", n_hashes=2048)
+    assert np.array_equal(estimated["size_a"], exact["size_a"])
+    assert np.allclose(estimated["jaccard"], exact["jaccard"], atol=0.05)
+    overlaps = count_sets_overlap(sequences, engine="minhash", n_hashes=2048)
+    assert np.allclose(overlaps, count_sets_overlap(sequences), rtol=0.1, atol=50)
+
+def test_minhash_mixed_dtypes():
+    items = list(range(1000))
+    sequences = [
+        np.arange(1000),
+        np.arange(1000, dtype=float),
+        items + ["a"],
+        [float(item) for item in items] + [np.nan, True],
+        items + [2**70],
+    ]
+    exact = compare_sets(sequences, upper=True)
+    estimated = compare_sets(sequences, upper=True, engine="minhash", n_hashes=1024)
+    assert np.allclose(estimated["jaccard"], exact["jaccard"], atol=0.01)
+    assert np.allclose(estimated["intersection"], exact["intersection"], rtol=0.01)
+
+def test_minhash_signature_size():
+    items = np.arange(40_000)
+    sequences = [items[:20_000], items[10_000:30_000]]
+    errors = [
+        abs(compare_sets(sequences, engine="minhash", n_hashes=n_hashes, seed=seed, upper=True)["jaccard"][0] - 1 / 3)
+        for n_hashes in [16, 4096] for seed in range(5)
+    ]
+    assert np.mean(errors[5:]) < np.mean(errors[:5])
+
+# ----- Streaming -----
+
+@pytest.fixture
+def records(sequences):
+    records = [(name, item) for (name, seq) in zip(list("ABCDE"), sequences) for item in seq]
+    return [records[i] for i in np.random.default_rng(seed=0).permutation(len(records))]
+
+@pytest.mark.parametrize("exclusive", [False, True])
+def test_stream_from_tuples(sequences, records, exclusive):
+    overlaps = count_sets_overlap_stream(iter(records + [("A", None)]), exclusive=exclusive, chunk_size=7)
+    expected = count_sets_overlap(sequences, names=list("ABCDE"), exclusive=exclusive)
+    names = list(overlaps.index)
+    assert sorted(names) == ["A", "B", "C", "E"]  # "D" is empty
+    assert overlaps.equals(expected.loc[names, names])
+
+@pytest.fixture
+def table(records):
+    table = pd.DataFrame(records, columns=["pathway", "gene"]).astype(str)
+    table.insert(0, "score", 1.0)
+    return table
+
+def test_stream_from_csv(sequences, table, tmp_path):
+    table.to_csv(tmp_path / "records.csv", index=False)
+    reader = pd.read_csv(tmp_path / "records.csv", chunksize=10, dtype=str)
+    overlaps = count_sets_overlap_stream(reader, columns=("pathway", "gene"))
+    expected = count_sets_overlap([[str(item) for item in seq] for seq in sequences], names=list("ABCDE"))
+    names = list(overlaps.index)
+    assert overlaps.equals(expected.loc[names, names])
+
+def test_stream_from_parquet(table, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    table.to_parquet(tmp_path / "records.parquet")
+    batches = pq.ParquetFile(tmp_path / "records.parquet").iter_batches(batch_size=10)
+    overlaps = count_sets_overlap_stream(batches, columns=("pathway", "gene"))
+    assert overlaps.equals(count_sets_overlap_stream(table.iloc[:, 1:].itertuples(index=False)))
@@ -0,0 +1,64 @@
+# tests/computation/test_sort.py
+
+import os
+import subprocess
+import sys
+
+import pytest
+import numpy as np
+import pandas as pd
+from natsort import natsorted
+
+from aa_utilities.computation._sort import code_natsorted, natsort_categorical, natsorted_dtype
+
+# ----- Initializations -----
+
+@pytest.fixture
+def visits():
+    rng = np.random.default_rng(seed=42)
+    values = np.array(["W1", "W2", "W11", "W17", "W3", "Day 10", "Day 9", "Baseline"], dtype=object)
+    return pd.Series(values[rng.integers(0, len(values), size=200)], name="visit", index=np.arange(200)[::-1])
+
+# ----- Natural sort -----
+
+def test_natsort_categorical(visits):
+    encoded = natsort_categorical(visits)
+    assert encoded.cat.ordered
+    assert list(encoded.cat.categories) == natsorted(visits.unique())
+    assert encoded.index.equals(visits.index) and encoded.name == "visit"
+    assert (encoded.astype(object) == visits).all()
+    expected = sorted(visits, key=natsorted(visits.unique()).index)
+    assert list(visits.sort_values(key=natsort_categorical, kind="stable")) == expected
+
+def test_code_natsorted(visits):
+    visits = visits.copy()
+    visits.iloc[:3] = None
+    frame = visits.to_frame().assign(group=np.arange(len(visits)) % 2)
+    ordered = frame.sort_values(by=["group", "visit"], key=code_natsorted)
+    assert pd.isna(ordered["visit"].iloc[-1])
+    for _, group in ordered.groupby("group"):
+        observed = group["visit"].dropna()
+        assert list(observed) == natsorted(observed)
+
+def test_natsorted_dtype_is_cached(visits):
+    dtype = natsorted_dtype(visits)
+    assert list(dtype.categories) == natsorted(visits.unique()) and dtype.ordered
+    assert natsorted_dtype(list(reversed(visits.tolist())) + [None]) is dtype
+    assert natsort_categorical(visits.iloc[::-1]).dtype is dtype
+    assert natsorted_dtype(["W2", "W11"]) is not dtype
+    assert list(natsorted_dtype(["W2", "W11"]).categories) == ["W2", "W11"]
+
+def test_natsorted_ties_do_not_depend_on_hash_seed():
+    code = (
+        "from aa_utilities.computation._sort import natsorted_dtype; "
+        "print(list(natsorted_dtype(['W01', 'W1', 'W2', 'W001', 'W10', 'W02', 'x']).categories))"
+    )
+    outputs = {
+        subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True, text=True,
+            env={**os.environ, "PYTHONHASHSEED": str(seed)},
+        ).stdout
+        for seed in range(1, 5)
+    }
+    assert len(outputs) == 1
+    assert outputs.pop().strip() == "['W001', 'W01', 'W1', 'W02', 'W2', 'W10', 'x']"
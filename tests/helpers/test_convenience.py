@@ -0,0 +1,53 @@
+# tests/helpers/test_convenience.py
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from aa_utilities.helpers import sort_by
+
+# ----- Initializations -----
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(seed=42)
+    n = 100
+    return pd.DataFrame({
+        'a': rng.integers(0, 5, size=n),
+        'b': rng.choice(list('wxyzq'), size=n),
+        'c': rng.normal(size=n),
+    })
+
+ORDERS = {'a': [3, 1, 2, 0], 'b': ['z', 'x', 'w']}
+
+# ----- sort_by -----
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")  # out-of-category values in `engine=pandas`
+@pytest.mark.parametrize("ascending", [True, False, [True, False]])
+@pytest.mark.parametrize("na_position", ["first", "last"])
+def test_codes_engine_matches_pandas(df, ascending, na_position):
+    expected = sort_by(df, ORDERS, ascending=ascending, na_position=na_position, engine='pandas')
+    assert sort_by(df, ORDERS, ascending=ascending, na_position=na_position).equals(expected)
+
+def test_series_is_stable(df):
+    ordered = sort_by(df['b'], ['z', 'x', 'z', 'w'], na_position='first')
+    dtype = pd.CategoricalDtype(['z', 'x', 'w'], ordered=True)
+    expected = pd.Series(pd.Categorical(df['b'].where(df['b'].isin(dtype.categories)), dtype=dtype), index=df.index)
+    assert ordered.index.equals(expected.sort_values(kind='stable', na_position='first').index)
+
+def test_return_indexer(df):
+    df = df.set_index(df['a'])  # duplicated labels
+    indexer = sort_by(df, ORDERS, return_indexer=True)
+    assert sorted(indexer) == list(range(len(df)))
+    assert df.iloc[indexer].equals(sort_by(df, ORDERS))
+
+def test_undefined_orders(df):
+    with pytest.raises(ValueError):
+        sort_by(df, {'b': ['k']})
+
+@pytest.mark.parametrize("n", [0, 1, 7, 50, 100, 150])
+@pytest.mark.parametrize("ascending", [True, [False, True]])
+def test_top_n(df, n, ascending):
+    expected = sort_by(df, ORDERS, ascending=ascending)
+    assert sort_by(df, ORDERS, ascending=ascending, n=n).equals(expected.head(n))
+    assert sort_by(df['b'], ORDERS['b'], n=n).equals(sort_by(df['b'], ORDERS['b']).head(n))